@@ -1,9 +1,21 @@
 import os
+import sys
+import tempfile
 import threading
 import numpy as np
 from scipy.io import wavfile
-from utils.matrix_utils import matrix_mod_inv
+from utils.matrix_utils import matrix_mod_inv_exact
 from utils.morse_utils import text_to_morse, morse_to_text
+from utils.structured_keys import StructuredKey, key_product
+from utils.metrics import instrument, record_pipeline
+from utils.planner import make_plan, working_set
+from utils.wav_io import create_wav, open_wav
+from utils.pipeline import run_pipeline
+from utils.output_cache import OutputCache, cache_key, key_fingerprint
+from utils.journal import ChunkJournal, chunk_digest
+from utils.keystream import make_keystream
+from utils.quality import QualityAnalyzer, analyze_wav
+from utils.kernels import audio_decrypt, audio_encrypt, fused
 
 # GUI/plot imports (optional at runtime; only used when launching GUI)
 try:
@@ -21,85 +33,496 @@ try:
 except Exception:
     HAS_WINSOUND = False
 
-def encrypt_audio(path, key_matrix, seed=1234):
-    rate, data = wavfile.read(path)
-    flat = data.flatten().astype(np.int64)
-    n = key_matrix.shape[0]
+# Memory budget for the GUI; larger inputs are streamed in chunks
+MAX_MEMORY = "512MB"
+# Files this large are streamed through the overlapped pipeline even when they fit in memory
+OVERLAP_MIN_BYTES = 64 * 1000 ** 2
+OVERLAP_CHUNK_BYTES = 8 * 1000 ** 2
 
-    # Pad to multiple of n
-    while len(flat) % n != 0:
-        flat = np.append(flat, 0)
 
-    blocks = flat.reshape(-1, n)
+# ---------- PCM formats ----------
+# Sample dtype -> unsigned word of the same width; wrap-around on it is the cipher modulus
+PCM_WORDS = {np.dtype(np.uint8): np.dtype(np.uint8), np.dtype(np.int16): np.dtype(np.uint16),
+             np.dtype(np.int32): np.dtype(np.uint32), np.dtype(np.float32): np.dtype(np.uint32)}
+_MODULUS_WORDS = {1 << 8: np.dtype(np.uint8), 1 << 16: np.dtype(np.uint16), 1 << 32: np.dtype(np.uint32)}
 
-    # --- Hill Cipher Encryption ---
-    encrypted = (blocks @ key_matrix.astype(np.int64)) % 65536
 
-    # --- Block Permutation (key-dependent) ---
-    np.random.seed(seed)
-    perm = np.random.permutation(encrypted.shape[0])
-    encrypted = encrypted[perm]
+def pcm_modulus(dtype) -> int:
+    """Cipher modulus of a WAV sample type: 2^8, 2^16 or 2^32 (float32 is bit-cast to uint32)."""
+    dtype = np.dtype(dtype)
+    if dtype not in PCM_WORDS:
+        raise ValueError(f"Unsupported sample type {dtype}; expected one of {', '.join(map(str, PCM_WORDS))}")
+    return 1 << (8 * dtype.itemsize)
 
-    # --- XOR Masking (key-dependent) ---
-    np.random.seed(seed + 1)  # different stream
-    mask = np.random.randint(0, 65536, size=encrypted.shape, dtype=np.int64)
-    encrypted = (encrypted + mask) % 65536
 
-    # Flatten and truncate back to original length
-    encrypted = encrypted.flatten()[:len(data)].astype(np.int16)
+def _frames(data):
+    """(frames, channels) view of the samples as unsigned words; no copy."""
+    pcm_modulus(data.dtype)
+    return data.reshape(len(data), -1).view(PCM_WORDS[np.dtype(data.dtype)])
 
-    # Save encrypted file
+
+def _read_pcm(path, mmap=False):
+    """Rate and samples of a WAV; 24-bit files, which scipy cannot map, are read as int32."""
+    try:
+        return wavfile.read(path, mmap=mmap)
+    except ValueError:
+        if not mmap:
+            raise
+        return wavfile.read(path)
+
+
+def _key_operand(key_matrix, modulus=65536):
+    """Key as the right operand of blocks @ K (dense int64 or structured)."""
+    if isinstance(key_matrix, StructuredKey):
+        if key_matrix.modulus != modulus:
+            raise ValueError(f"Structured key modulus {key_matrix.modulus} does not match {modulus}")
+        return key_matrix
+    return np.asarray(key_matrix).astype(np.int64)
+
+
+def _inverse_operand(key, modulus=65536):
+    if isinstance(key, StructuredKey):
+        return key.inverse()
+    return matrix_mod_inv_exact(key, modulus)
+
+
+def _hill_product(blocks, key, modulus=65536):
+    """blocks @ key mod modulus, computed in the unsigned word whose wrap-around is the modulus.
+
+    Dense keys need no wider type: every product and sum wraps exactly
+    like the modular arithmetic it stands for.
+    """
+    word = _MODULUS_WORDS[modulus]
+    if isinstance(key, StructuredKey):
+        return (blocks.astype(np.int64) @ key).astype(word)
+    return np.matmul(blocks.astype(word, copy=False), (key % modulus).astype(word))
+
+
+def _file_size(path, *args, **kwargs):
+    return os.path.getsize(path)
+
+
+def _output_path(path, suffix):
     project_root = os.path.dirname(os.path.dirname(__file__))
     audios_dir = os.path.join(project_root, "audios")
     os.makedirs(audios_dir, exist_ok=True)
     base = os.path.splitext(os.path.basename(path))[0]
-    out_path = os.path.join(audios_dir, f"{base}-encrypted.wav")
+    return os.path.join(audios_dir, f"{base}-{suffix}.wav")
+
+
+def _per_sample(dtype, block_size):
+    # Input, output and the int64 mask draw, plus gathered blocks, product and mask in the sample word
+    return working_set(dtype, block_size, ("mask",)) + 3 * np.dtype(dtype).itemsize
+
+
+def plan_audio(data, n, max_memory=None):
+    """Execution plan for encrypting/decrypting data with an n x n key (blocks span all channels)."""
+    channels = data.size // max(len(data), 1)
+    blocks = -(-len(data) // n)
+    # Only the block permutation stays resident; streamed input and output are memory-mapped
+    return make_plan(blocks * n * channels, n * channels, max_memory, _per_sample(data.dtype, n * channels),
+                     fixed=8 * blocks, streaming_fixed=8 * blocks)
+
+
+# ---------- Streaming (chunked) paths ----------
+def _gather_blocks(frames, idx, n):
+    """Zero-padded blocks idx of a (frames, channels) buffer, as (len(idx), channels, n) rows per channel."""
+    full = len(frames) // n
+    blocks = np.zeros((len(idx), frames.shape[1], n), dtype=frames.dtype)
+    inside = idx < full
+    blocks[inside] = frames[:full * n].reshape(full, n, frames.shape[1])[idx[inside]].transpose(0, 2, 1)
+    for r in np.flatnonzero(~inside):
+        tail = frames[full * n:]
+        blocks[r, :, :len(tail)] = tail.T
+    return blocks
+
+
+def _scatter_blocks(out, idx, blocks, n):
+    """Write (k, channels, n) blocks to block positions idx of out, truncating a partial last block."""
+    full = len(out) // n
+    inside = idx < full
+    out[:full * n].reshape(full, n, out.shape[1])[idx[inside]] = blocks[inside].transpose(0, 2, 1)
+    for r in np.flatnonzero(~inside):
+        out[full * n:] = blocks[r, :, :len(out) - full * n].T
+
+
+def _interleave(blocks):
+    """(k, channels, n) blocks back to contiguous (k * n, channels) frames."""
+    # A single multichannel block reshapes to a strided view, which chunk_digest cannot hash
+    return np.ascontiguousarray(blocks.transpose(0, 2, 1).reshape(-1, blocks.shape[1]))
+
+
+# ---------- Resumable jobs ----------
+def _job_journal(op, path, key, seed, keystream, step, out_path, modulus=65536):
+    st = os.stat(path)
+    params = {"op": op, "input": [os.path.abspath(path), st.st_size, st.st_mtime_ns],
+              "key": key_fingerprint(key, modulus).hex(), "seed": seed, "keystream": keystream,
+              "chunk_blocks": step, "output": os.path.abspath(out_path)}
+    return ChunkJournal(out_path + ".journal", params)
+
+
+def _job_output(out_path, rate, num_frames, dtype, channels, journal):
+    """Output samples as a (frames, channels) word view, plus the memmap to flush."""
+    size = num_frames * channels
+    out = open_wav(out_path, rate, size, dtype, channels) if journal is not None and journal.digests else None
+    out = create_wav(out_path, rate, size, dtype, channels) if out is None else out
+    return out, _frames(out.reshape(num_frames, channels))
+
+
+def _resume(journal, ks, digest_of, step):
+    """First chunk still to do, with the mask stream advanced to it."""
+    if journal is None:
+        return 0
+    start = journal.resume(digest_of)
+    if start and journal.state is not None:
+        ks.restore(journal.state)
+    else:
+        ks.skip(min(start * step, ks.num_blocks))
+    if start:
+        print(f"Resuming after {start} verified chunk(s)")
+    return start
+
+
+# ---------- Streaming paths ----------
+def _chunk_positions(k, step, num_blocks):
+    return np.arange(k * step, min((k + 1) * step, num_blocks))
+
+
+def _encrypt_stream(data, rate, key, seed, plan, out_path, journal=None, keystream="legacy", quality=None):
+    frames = _frames(data)
+    modulus = pcm_modulus(data.dtype)
+    n, channels = key.shape[0], frames.shape[1]
+    num_blocks = -(-len(frames) // n)
+    # Masks are drawn chunk by chunk in output order, n per channel of each block
+    ks = make_keystream(keystream, seed, num_blocks, n * channels, modulus)
+    step = max(plan.chunk_blocks, 1)
+
+    out, dst = _job_output(out_path, rate, num_blocks * n, data.dtype, channels, journal)
+    if quality is not None:
+        quality.bind(modulus, channels)
+
+    def region(k):
+        return dst[k * step * n:(k + 1) * step * n]
+    start = _resume(journal, ks, lambda k: chunk_digest(region(k)), step)
+    for k in range(start if quality is not None else 0):
+        quality.update(region(k))
+    fuse = fused() and not isinstance(key, StructuredKey)
+
+    def read(k):
+        idx = ks.perm(_chunk_positions(k, step, num_blocks))
+        # The fused kernel gathers the blocks itself
+        return k, idx if fuse else _gather_blocks(frames, idx, n)
+
+    def compute(chunk):
+        k, blocks = chunk
+        masks = ks.next_masks(len(blocks))
+        if fuse:
+            samples = audio_encrypt(frames, blocks, key, masks, modulus)
+        else:
+            encrypted = _hill_product(blocks, key, modulus)
+            encrypted += masks.reshape(encrypted.shape).astype(encrypted.dtype)
+            samples = _interleave(encrypted)
+        return k, samples, ks.state() if journal is not None else None
+
+    def write(result):
+        k, samples, state = result
+        region(k)[:] = samples
+        if journal is not None:
+            out.flush()
+            journal.commit(k, chunk_digest(samples), state)
+
+    reads = (read(k) for k in range(start, -(-num_blocks // step)))
+    observe = None if quality is None else lambda result: quality.update(result[1])
+    record_pipeline("audio", "encrypt", run_pipeline(reads, compute, write, observe=observe))
+    out.flush()
+    if journal is not None:
+        journal.finish()
+
 
-    wavfile.write(out_path, rate, encrypted)
+def _decrypt_stream(data, rate, key, seed, plan, out_path, journal=None, keystream="legacy"):
+    frames = _frames(data)
+    modulus = pcm_modulus(data.dtype)
+    n, channels = key.shape[0], frames.shape[1]
+    num_blocks = -(-len(frames) // n)
+    ks = make_keystream(keystream, seed, num_blocks, n * channels, modulus)
+    inv_matrix = _inverse_operand(key, modulus)
+    step = max(plan.chunk_blocks, 1)
+
+    out, dst = _job_output(out_path, rate, len(frames), data.dtype, channels, journal)
+
+    def written(k):
+        return _gather_blocks(dst, ks.perm(_chunk_positions(k, step, num_blocks)), n)
+    start = _resume(journal, ks, lambda k: chunk_digest(written(k)), step)
+    fuse = fused() and not isinstance(inv_matrix, StructuredKey)
+
+    def read(k):
+        positions = _chunk_positions(k, step, num_blocks)
+        return k, positions if fuse else _gather_blocks(frames, positions, n)
+
+    def compute(chunk):
+        k, blocks = chunk
+        masks = ks.next_masks(len(blocks))
+        if fuse:
+            decrypted = audio_decrypt(frames, blocks, inv_matrix, masks, modulus)
+        else:
+            blocks -= masks.reshape(blocks.shape).astype(blocks.dtype)
+            decrypted = _hill_product(blocks, inv_matrix, modulus)
+        return k, decrypted, ks.state() if journal is not None else None
+
+    def write(result):
+        k, decrypted, state = result
+        _scatter_blocks(dst, ks.perm(_chunk_positions(k, step, num_blocks)), decrypted, n)
+        if journal is not None:
+            out.flush()
+            journal.commit(k, chunk_digest(written(k)), state)
+
+    reads = (read(k) for k in range(start, -(-num_blocks // step)))
+    record_pipeline("audio", "decrypt", run_pipeline(reads, compute, write))
+    out.flush()
+    if journal is not None:
+        journal.finish()
+
+
+def _pipelined(plan, data, n):
+    """Streaming plan with chunks small enough for the read/compute/write stages to overlap.
+
+    Chunks queued between stages hold only the gathered blocks and the
+    output samples, so halving a budget-limited chunk keeps the pipeline
+    within the budget.
+    """
+    channels = data.size // max(len(data), 1)
+    step = max(1, OVERLAP_CHUNK_BYTES // (data.itemsize * n * channels))
+    if plan.strategy == "streaming":
+        step = min(step, max(1, plan.chunk_blocks // 2))
+    blocks = -(-len(data) // n)
+    step = max(1, min(step, blocks))
+    per_chunk = step * n * channels * _per_sample(data.dtype, n * channels)
+    return plan._replace(strategy="streaming", chunk_blocks=step, chunks=-(-blocks // step),
+                         peak_bytes=8 * blocks + 2 * per_chunk)
+
+
+def _pcm_format(path):
+    """Cipher modulus and cache-mode suffix of a WAV's sample format.
+
+    Mono int16, whose output never changed, has no suffix.
+    """
+    _, data = _read_pcm(path, mmap=True)
+    channels = data.size // max(len(data), 1)
+    tag = "" if data.dtype == np.int16 and channels == 1 else f"/{np.dtype(data.dtype).name}x{channels}"
+    return pcm_modulus(data.dtype), tag
+
+
+def _cached(cache, op, path, key_matrix, seed, keystream, produce):
+    if cache is None:
+        return produce()
+    modulus, tag = _pcm_format(path)
+    mode = f"audio/{op}/seed={seed}" + ("" if keystream == "legacy" else f"/{keystream}") + tag
+    name = cache_key(path, _key_operand(key_matrix, modulus), modulus, mode)
+    suffix = "encrypted" if op == "encrypt" else "decrypted"
+    return cache.fetch(name, ".wav", _output_path(path, suffix), produce)
+
+
+@instrument("audio", "encrypt", size_in=_file_size, size_out=_file_size)
+def encrypt_audio(path, key_matrix, seed=1234, max_memory=None, cache: OutputCache | None = None,
+                  resumable=False, keystream="legacy", quality: QualityAnalyzer | None = None):
+    """Encrypt a WAV into audios/<name>-encrypted.wav; a cache hit skips the work.
+
+    8-bit, 16-bit, 32-bit (and 24-bit, stored as 32-bit) integer and
+    float32 WAVs are encrypted in their own sample format and channel
+    layout, mod 2^8, 2^16 or 2^32 (float samples by their bits).
+    resumable=True runs a chunked job with a checkpoint journal next to the
+    output, so an interrupted run continues after its last verified chunk.
+    keystream="seekable" makes any time range decryptable on its own (see
+    decrypt_range); the file must then be decrypted with the same setting.
+    A QualityAnalyzer passed as quality sees every encrypted chunk as it is
+    written (a cached output is scanned instead); call its report() after.
+    """
+    produced = []
+
+    def produce():
+        produced.append(True)
+        return _encrypt_file(path, key_matrix, seed, max_memory, resumable, keystream, quality)
+    out_path = _cached(cache, "encrypt", path, key_matrix, seed, keystream, produce)
+    if quality is not None and not produced:
+        analyze_wav(out_path, quality)
+    return out_path
+
+
+@instrument("audio", "decrypt", size_in=_file_size, size_out=_file_size)
+def decrypt_audio(path, key_matrix, seed=1234, max_memory=None, cache: OutputCache | None = None,
+                  resumable=False, keystream="legacy"):
+    """Decrypt a WAV into audios/<name>-decrypted.wav; a cache hit skips the work."""
+    return _cached(cache, "decrypt", path, key_matrix, seed, keystream,
+                   lambda: _decrypt_file(path, key_matrix, seed, max_memory, resumable, keystream))
+
+
+def _file_plan(data, n, max_memory, overlap):
+    plan = plan_audio(data, n, max_memory)
+    return _pipelined(plan, data, n) if plan.strategy == "streaming" or overlap else plan
+
+
+def plan_audio_file(path, key_matrix, max_memory=None, resumable=False):
+    """Plan encrypt_audio/decrypt_audio would run a WAV with, from a memory map of its samples."""
+    _, data = _read_pcm(path, mmap=True)
+    n = _key_operand(key_matrix, pcm_modulus(data.dtype)).shape[0]
+    return _file_plan(data, n, max_memory, resumable or os.path.getsize(path) >= OVERLAP_MIN_BYTES)
+
+
+def _transform_file(op, path, key_matrix, seed, max_memory, resumable, keystream, quality=None, out_path=None):
+    overlap = resumable or os.path.getsize(path) >= OVERLAP_MIN_BYTES
+    rate, data = _read_pcm(path, mmap=max_memory is not None or overlap)
+    modulus = pcm_modulus(data.dtype)
+    key = _key_operand(key_matrix, modulus)
+    plan = _file_plan(data, key.shape[0], max_memory, overlap)
+    out_path = out_path or _output_path(path, f"{op}ed")
+    journal = (_job_journal(op, path, key, seed, keystream, plan.chunk_blocks, out_path, modulus)
+               if resumable else None)
+    if op == "encrypt":
+        _encrypt_stream(data, rate, key, seed, plan, out_path, journal, keystream, quality)
+    else:
+        _decrypt_stream(data, rate, key, seed, plan, out_path, journal, keystream)
     print(f"Saved {out_path}")
     return out_path
 
-def decrypt_audio(path, key_matrix, seed=1234):
-    rate, data = wavfile.read(path)
-    flat = data.flatten().astype(np.int64)
-    n = key_matrix.shape[0]
 
-    # Pad to multiple of n
-    while len(flat) % n != 0:
-        flat = np.append(flat, 0)
+def _encrypt_file(path, key_matrix, seed, max_memory, resumable=False, keystream="legacy", quality=None,
+                  out_path=None):
+    # Padding is kept: after the permutation any block may end up last,
+    # so truncating would make the file undecryptable
+    return _transform_file("encrypt", path, key_matrix, seed, max_memory, resumable, keystream, quality, out_path)
 
-    blocks = flat.reshape(-1, n)
 
-    # --- Undo XOR Masking ---
-    np.random.seed(seed + 1)  # same as encryption
-    mask = np.random.randint(0, 65536, size=blocks.shape, dtype=np.int64)
-    blocks = (blocks - mask) % 65536
+def _decrypt_file(path, key_matrix, seed, max_memory, resumable=False, keystream="legacy", out_path=None):
+    return _transform_file("decrypt", path, key_matrix, seed, max_memory, resumable, keystream, out_path=out_path)
 
-    # --- Undo Block Permutation ---
-    np.random.seed(seed)
-    perm = np.random.permutation(blocks.shape[0])
-    inv_perm = np.argsort(perm)  # inverse permutation
-    blocks = blocks[inv_perm]
 
-    # --- Hill Cipher Decryption ---
-    inv_matrix = matrix_mod_inv(key_matrix, 65536).astype(np.int64)
-    decrypted = (blocks @ inv_matrix) % 65536
+@instrument("audio", "rekey", size_in=_file_size, size_out=_file_size)
+def rekey_audio(path, old_key, new_key, old_seed=1234, new_seed=None, max_memory=None, keystream="legacy"):
+    """Re-encrypt an encrypted WAV under a new key (and optionally seed) without decrypting it.
 
-    # Flatten and truncate back to original length
-    decrypted = decrypted.flatten()[:len(data)].astype(np.int16)
+    Output block j is (E[i] - mask_old[i]) @ K_old^-1 K_new + mask_new[j],
+    where i is the old position of the same source block. The intermediate
+    is still Hill-encrypted, so plaintext never appears in a buffer.
+    """
+    new_seed = old_seed if new_seed is None else new_seed
+    rate, data = _read_pcm(path, mmap=True)
+    modulus = pcm_modulus(data.dtype)
+    old, new = _key_operand(old_key, modulus), _key_operand(new_key, modulus)
+    n = old.shape[0]
+    if new.shape[0] != n:
+        raise ValueError(f"Key sizes differ: {n} vs {new.shape[0]}")
+    frames = _frames(data)
+    channels = frames.shape[1]
+    if len(frames) % n:
+        raise ValueError("File length is not a whole number of blocks (truncated legacy "
+                         "encryption); decrypt and re-encrypt it instead")
+    num_blocks = len(frames) // n
+    src = frames.reshape(num_blocks, n, channels)
+    transition = key_product(_inverse_operand(old, modulus), new, modulus)
+    step = plan_audio(data, n, max_memory).chunk_blocks
+    old_ks = make_keystream(keystream, old_seed, num_blocks, n * channels, modulus)
+    new_ks = make_keystream(keystream, new_seed, num_blocks, n * channels, modulus)
 
-    # Save decrypted file
-    project_root = os.path.dirname(os.path.dirname(__file__))
-    audios_dir = os.path.join(project_root, "audios")
-    os.makedirs(audios_dir, exist_ok=True)
-    base = os.path.splitext(os.path.basename(path))[0]
-    out_path = os.path.join(audios_dir, f"{base}-decrypted.wav")
+    def next_masks(ks, count):
+        return ks.next_masks(count).reshape(count, channels, n).astype(frames.dtype)
 
-    wavfile.write(out_path, rate, decrypted)
+    out_path = _output_path(path, "rekeyed")
+    out = create_wav(out_path, rate, data.size, data.dtype, channels)
+    dst = _frames(out.reshape(len(frames), channels)).reshape(num_blocks, n, channels)
+    if new_seed == old_seed:
+        # Same permutation and mask stream: one sequential pass
+        for a in range(0, num_blocks, step):
+            blocks = src[a:a + step].transpose(0, 2, 1)
+            mask = next_masks(old_ks, len(blocks))
+            moved = _hill_product(blocks - mask, transition, modulus)
+            moved += mask
+            dst[a:a + step] = moved.transpose(0, 2, 1)
+    else:
+        # Pass 1: unmask, re-key and move each block to its new position
+        for a in range(0, num_blocks, step):
+            blocks = src[a:a + step].transpose(0, 2, 1)
+            moved = _hill_product(blocks - next_masks(old_ks, len(blocks)), transition, modulus)
+            target = new_ks.inverse(old_ks.perm(_chunk_positions(a // step, step, num_blocks)))
+            dst[target] = moved.transpose(0, 2, 1)
+        # Pass 2: apply the new mask in output order
+        for a in range(0, num_blocks, step):
+            dst[a:a + step] += next_masks(new_ks, len(dst[a:a + step])).transpose(0, 2, 1)
+    out.flush()
     print(f"Saved {out_path}")
     return out_path
 
 
+@instrument("audio", "decrypt_range", size_out=lambda samples: samples.nbytes)
+def decrypt_range(path, key_matrix, start_s, end_s, seed=1234, keystream="legacy"):
+    """Decrypted samples of an encrypted WAV between start_s and end_s seconds.
+
+    The result has the file's sample type and one column per channel
+    (1-D for mono). Only the blocks covering the window are located, read
+    through a memory map and unmasked, so with keystream="seekable" the
+    cost grows with the window, not the file. Legacy files still build the
+    whole permutation and replay the mask stream up to the last needed block.
+    """
+    rate, data = _read_pcm(path, mmap=True)
+    modulus = pcm_modulus(data.dtype)
+    frames = _frames(data)
+    channels = frames.shape[1]
+    key = _key_operand(key_matrix, modulus)
+    n = key.shape[0]
+    first = min(max(0, round(start_s * rate)), len(frames))
+    last = min(max(first, round(end_s * rate)), len(frames))
+    if first == last:
+        return np.zeros((0,) + data.shape[1:], dtype=data.dtype)
+    blocks = np.arange(first // n, -(-last // n))
+    ks = make_keystream(keystream, seed, -(-len(frames) // n), n * channels, modulus)
+    positions = ks.inverse(blocks)
+    masked = _gather_blocks(frames, positions, n)
+    masked -= ks.masks_at(positions).reshape(masked.shape).astype(masked.dtype)
+    decrypted = _interleave(_hill_product(masked, _inverse_operand(key, modulus), modulus))
+    offset = first - blocks[0] * n
+    window = decrypted[offset:offset + last - first].view(data.dtype)
+    return window.reshape((-1,) + data.shape[1:])
+
+
+# ---------- Self-check ----------
+def check_resumable(frames: int = 20001, channels: int = 2, chunk_bytes: int = 4000, seed: int = 0) -> int:
+    """Resumable encrypt/decrypt round trips whose last chunk holds a single block.
+
+    Runs both keystreams in a temporary directory with chunk_bytes-sized
+    chunks, checks that a resumable run matches a plain one and that a
+    second run over the finished journal leaves the output unchanged.
+    Prints one line per case and returns the number of failures.
+    """
+    global OVERLAP_CHUNK_BYTES
+    samples = np.random.default_rng(seed).integers(-32768, 32768, size=(frames, channels), dtype=np.int16)
+    key = np.array([[3, 3], [2, 5]])
+    failures, previous = 0, OVERLAP_CHUNK_BYTES
+    OVERLAP_CHUNK_BYTES = chunk_bytes
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "check.wav")
+            wavfile.write(path, 8000, samples)
+
+            def run(op, src, name, resumable, keystream):
+                out_path = os.path.join(directory, f"{keystream}-{name}.wav")
+                transform = _encrypt_file if op == "encrypt" else _decrypt_file
+                transform(src, key, 1234, None, resumable, keystream, out_path=out_path)
+                return out_path
+            for keystream in ("legacy", "seekable"):
+                plain = run("encrypt", path, "plain", False, keystream)
+                encrypted = run("encrypt", path, "resumable", True, keystream)
+                first = wavfile.read(encrypted)[1].copy()
+                run("encrypt", path, "resumable", True, keystream)
+                decrypted = run("decrypt", encrypted, "decrypted", True, keystream)
+                ok = (np.array_equal(first, wavfile.read(plain)[1])
+                      and np.array_equal(first, wavfile.read(encrypted)[1])
+                      and np.array_equal(wavfile.read(decrypted)[1][:frames], samples))
+                failures += not ok
+                print(f"{keystream:>8} {channels}ch {frames} frames: {'ok' if ok else 'mismatch'}")
+    finally:
+        OVERLAP_CHUNK_BYTES = previous
+    return failures
+
+
 class ModernAudioCipher:
     def __init__(self, parent=None):
         self.parent = parent
@@ -107,6 +530,7 @@ class ModernAudioCipher:
         self.current_path = None
         self.encrypted_path = "encrypted.wav"
         self.decrypted_path = "decrypted.wav"
+        self.cache = OutputCache(cipher="audio")
         self.key_matrix = np.array([[3, 3], [2, 5]], dtype=int)
         self.setup_window()
         self.create_widgets()
@@ -550,8 +974,10 @@ class ModernAudioCipher:
         try:
             self.update_status("🔐 Encrypting audio file...", '#ff9800')
             
+            print(f"Plan: {plan_audio_file(self.current_path, self.key_matrix, MAX_MEMORY)}")
             # Perform encryption
-            encrypted_path = encrypt_audio(self.current_path, self.key_matrix)
+            encrypted_path = encrypt_audio(self.current_path, self.key_matrix, max_memory=MAX_MEMORY,
+                                           cache=self.cache)
             
             if encrypted_path:
                 self.encrypted_path = encrypted_path
@@ -586,8 +1012,10 @@ class ModernAudioCipher:
         try:
             self.update_status("🔓 Decrypting audio file...", '#9c27b0')
             
+            print(f"Plan: {plan_audio_file(source_path, self.key_matrix, MAX_MEMORY)}")
             # Perform decryption
-            decrypted_path = decrypt_audio(source_path, self.key_matrix)
+            decrypted_path = decrypt_audio(source_path, self.key_matrix, max_memory=MAX_MEMORY,
+                                           cache=self.cache)
             
             if decrypted_path:
                 self.decrypted_path = decrypted_path
@@ -634,4 +1062,6 @@ def run(parent=None):
 
 
 if __name__ == "__main__":
+    if sys.argv[1:] == ["--check"]:
+        raise SystemExit(1 if check_resumable() else 0)
     run()
\ No newline at end of file
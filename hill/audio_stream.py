@@ -0,0 +1,199 @@
+"""Frame-based Hill cipher for live audio.
+
+AudioStreamCipher takes int16 PCM frames of any size (a capture callback,
+a socket read) and returns encrypted frames; AudioStreamDecipher undoes it
+on the receiving side. Samples are held back only until a key-sized block
+is complete, so the algorithmic latency is at most n - 1 samples. Live
+blocks cannot be permuted across the stream, so each block is masked by
+its sample counter with the seekable keystream instead; use a fresh seed
+for every stream.
+
+    python -m hill.audio_stream [file.wav]    # latency/jitter benchmark at 48 kHz
+"""
+import os
+import sys
+import tempfile
+from time import perf_counter
+import numpy as np
+from scipy.io import wavfile
+from hill.audio_cipher import _key_operand, _inverse_operand, _hill_product
+from utils.structured_keys import StructuredKey
+from utils.keystream import SeekableKeystream
+
+STREAM_RATE = 48000
+DEFAULT_FRAME = 480       # 10 ms at 48 kHz
+
+
+class _AudioStream:
+    """Block alignment and reusable buffers shared by both directions."""
+
+    def __init__(self, matrix, seed: int, max_frame: int):
+        self.n = matrix.shape[0]
+        self._matrix = matrix
+        # Every product sum stays below 2^53, so float64 BLAS is exact (n < 2^21)
+        self._float = None if isinstance(matrix, StructuredKey) else np.asarray(matrix % 65536, dtype=np.float64)
+        self._ks = SeekableKeystream(seed, 1, self.n)
+        self._carry = np.empty(self.n, dtype=np.uint16)
+        self._pending = 0
+        self.samples = 0          # samples emitted so far
+        self._capacity = 0
+        self._reserve(max_frame + self.n)
+
+    @property
+    def latency(self) -> int:
+        """Worst-case samples held back waiting for a complete block."""
+        return self.n - 1
+
+    def _reserve(self, size: int):
+        if size <= self._capacity:
+            return
+        self._capacity = size
+        self._a = np.empty(size, dtype=np.float64)
+        self._b = np.empty(size, dtype=np.float64)
+        self._mask = np.empty(size, dtype=np.uint64)
+        self._tmp = np.empty(size, dtype=np.uint64)
+        self._out = np.empty(size, dtype=np.int16)
+
+    def _product(self, A: np.ndarray, B: np.ndarray):
+        if self._float is None:
+            B[:] = _hill_product(A.astype(np.int64), self._matrix)
+        else:
+            np.matmul(A, self._float, out=B)
+
+    def process(self, frame: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """Transform one int16 frame; returns the samples that completed a block.
+
+        Without out the result is a view of an internal buffer, valid until
+        the next call. Frames up to max_frame samples allocate nothing.
+        """
+        frame = np.asarray(frame)
+        if frame.dtype != np.int16:
+            raise ValueError(f"Expected int16 PCM, got {frame.dtype}")
+        src = frame.reshape(-1).view(np.uint16)
+        have = self._pending
+        total = have + src.size
+        emit = total - total % self.n
+        if emit == 0:
+            self._carry[have:total] = src
+            self._pending = total
+            return self._out[:0] if out is None else out[:0]
+        self._reserve(emit)
+        A = self._a[:emit]
+        A[:have] = self._carry[:have]
+        np.copyto(A[have:], src[:emit - have])
+        rest = src[emit - have:]
+        self._carry[:rest.size] = rest
+        self._pending = rest.size
+
+        mask = self._ks.sample_masks_into(self.samples, self._mask[:emit], self._tmp[:emit])
+        R = self._transform(A.reshape(-1, self.n), self._b[:emit].reshape(-1, self.n), mask)
+        dest = self._out[:emit] if out is None else out[:emit]
+        np.copyto(dest, R, casting="unsafe")   # [0, 65536) wraps onto int16
+        self.samples += emit
+        return dest
+
+    def flush(self, out: np.ndarray | None = None) -> np.ndarray:
+        """Zero-pad and emit a trailing partial block (empty if the stream is aligned)."""
+        if not self._pending:
+            return self._out[:0] if out is None else out[:0]
+        return self.process(np.zeros(self.n - self._pending, dtype=np.int16), out)
+
+    def _reduce(self, P: np.ndarray) -> np.ndarray:
+        # Reduce as int64 in A's memory, which the product no longer needs
+        R = self._a[:P.size].view(np.int64)
+        np.copyto(R, P.reshape(-1), casting="unsafe")
+        return np.bitwise_and(R, 0xFFFF, out=R)
+
+
+class AudioStreamCipher(_AudioStream):
+    """Encrypt live int16 PCM frame by frame: (block @ K + mask) mod 65536."""
+
+    def __init__(self, key_matrix, seed: int = 1234, max_frame: int = 4096):
+        super().__init__(_key_operand(key_matrix), seed, max_frame)
+
+    def _transform(self, A, B, mask):
+        self._product(A, B)
+        np.add(B.reshape(-1), mask, out=B.reshape(-1))
+        return self._reduce(B)
+
+
+class AudioStreamDecipher(_AudioStream):
+    """Decrypt frames produced by an AudioStreamCipher with the same key and seed."""
+
+    def __init__(self, key_matrix, seed: int = 1234, max_frame: int = 4096):
+        super().__init__(_inverse_operand(_key_operand(key_matrix)), seed, max_frame)
+
+    def _transform(self, A, B, mask):
+        flat = A.reshape(-1)
+        np.subtract(flat, mask, out=flat)
+        flat += 65536                         # non-negative; the product reduces it
+        self._product(A, B)
+        return self._reduce(B)
+
+
+# ---------- Frame sources ----------
+def wav_frames(path: str, frame_sizes=DEFAULT_FRAME):
+    """Yield successive int16 frames of a WAV file, read through a memory map.
+
+    frame_sizes is a frame length or a sequence of lengths used in turn,
+    e.g. to mimic a capture callback with irregular buffer sizes.
+    """
+    _, data = wavfile.read(path, mmap=True)
+    flat = data.reshape(-1)
+    sizes = [frame_sizes] if isinstance(frame_sizes, int) else list(frame_sizes)
+    pos, k = 0, 0
+    while pos < flat.size:
+        size = sizes[k % len(sizes)]
+        yield flat[pos:pos + size]
+        pos += size
+        k += 1
+
+
+# ---------- Benchmark ----------
+def _frame_times(stream, frames) -> tuple[np.ndarray, list]:
+    times, outputs = [], []
+    for frame in frames:
+        start = perf_counter()
+        result = stream.process(frame)
+        times.append(perf_counter() - start)
+        outputs.append(result.copy())
+    outputs.append(stream.flush().copy())
+    return np.array(times), outputs
+
+
+def benchmark(path: str | None = None, frame: int = DEFAULT_FRAME, key_matrix=None, seed: int = 1234):
+    """Per-frame processing time and jitter of the encryptor and decryptor at 48 kHz."""
+    key_matrix = np.array([[3, 3], [2, 5]]) if key_matrix is None else key_matrix
+    tmp = None
+    if path is None:
+        tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+        tmp.close()
+        noise = np.random.default_rng(seed).integers(-32768, 32768, size=10 * STREAM_RATE, dtype=np.int16)
+        wavfile.write(tmp.name, STREAM_RATE, noise)
+        path = tmp.name
+    try:
+        _, data = wavfile.read(path, mmap=True)
+        encryptor = AudioStreamCipher(key_matrix, seed, max_frame=frame)
+        decryptor = AudioStreamDecipher(key_matrix, seed, max_frame=frame)
+        enc_times, encrypted = _frame_times(encryptor, wav_frames(path, frame))
+        dec_times, decrypted = _frame_times(decryptor, (e for e in encrypted if e.size))
+        restored = np.concatenate(decrypted)[:data.size]
+        assert (restored == data.reshape(-1)).all(), "round trip failed"
+    finally:
+        if tmp is not None:
+            os.remove(tmp.name)
+    budget = frame / STREAM_RATE
+    print(f"frame {frame} samples ({budget * 1e3:.1f} ms), algorithmic latency {encryptor.latency} sample(s) "
+          f"({encryptor.latency / STREAM_RATE * 1e6:.0f} us)")
+    print(f"{'stage':>8} {'mean us':>9} {'p50 us':>8} {'p99 us':>8} {'max us':>8} {'jitter us':>10} {'x realtime':>11}")
+    results = {}
+    for name, t in (("encrypt", enc_times), ("decrypt", dec_times)):
+        us = t * 1e6
+        results[name] = {"mean": t.mean(), "p99": np.percentile(t, 99), "max": t.max(), "jitter": t.std()}
+        print(f"{name:>8} {us.mean():>9.1f} {np.percentile(us, 50):>8.1f} {np.percentile(us, 99):>8.1f} "
+              f"{us.max():>8.1f} {us.std():>10.1f} {budget / t.mean():>11.0f}")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else None)
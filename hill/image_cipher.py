@@ -1,87 +1,647 @@
 import os
+import hashlib
+import threading
 import numpy as np
-from math import gcd
-import imageio.v2 as imageio
+from functools import lru_cache
 from PIL import Image, ImageTk
 import tkinter as tk
 from tkinter import filedialog, messagebox
+from utils.matrix_utils import batch_mod_inv, mod_matmul
+from utils.structured_keys import StructuredKey, key_product
+from utils.metrics import KEY_CACHE, instrument, record_pipeline
+from utils.planner import Plan, make_plan, working_set
+from utils.output_cache import OutputCache, cache_key, key_fingerprint
+from utils.journal import ChunkJournal, chunk_digest
+from utils.pipeline import run_pipeline
+from utils.quality import QualityAnalyzer, analyze_image
+from utils.kernels import fused, hill_rows
+from utils.image_io import (FORMATS, ENCRYPTED_FORMAT, DECRYPTED_FORMAT, RawTiles, format_for, map_pixels,
+                            open_writer)
+
+# Memory budget for the GUI; larger images are processed in chunks
+MAX_MEMORY = "512MB"
+# Row strips of about this many bytes overlap encoding with PNG compression
+STRIP_BYTES = 8 * 1000 ** 2
 
 
 # ---------- Math helpers ----------
 def mod_matrix_inv(matrix: np.ndarray, modulus: int) -> np.ndarray:
     """Modular inverse of a square integer matrix under given modulus."""
-    n = matrix.shape[0]
-    det_val = int(round(np.linalg.det(matrix))) % modulus
-    if gcd(det_val, modulus) != 1:
-        raise ValueError(f"Matrix determinant {det_val} not invertible mod {modulus}")
-    det_inv = pow(det_val, -1, modulus)
+    # Exact elimination: float determinants/cofactors break down for n >= ~16
+    inv, ok = batch_mod_inv(np.asarray(matrix, dtype=np.int64), modulus)
+    if not ok:
+        raise ValueError(f"Matrix determinant not invertible mod {modulus}")
+    return inv
 
-    cofactors = np.zeros((n, n), dtype=int)
-    for i in range(n):
-        for j in range(n):
-            minor = np.delete(np.delete(matrix, i, axis=0), j, axis=1)
-            cofactors[i, j] = ((-1) ** (i + j)) * int(round(np.linalg.det(minor)))
 
-    adj = (cofactors.T % modulus)
-    return (det_inv * adj) % modulus
+def _build_pair_table(key: tuple, modulus: int) -> np.ndarray:
+    """uint16 lookup table mapping every byte pair to its transformed pair (2x2 keys)."""
+    K = np.array(key, dtype=np.int64).reshape(2, 2)
+    pairs = np.arange(65536, dtype=np.uint16).view(np.uint8).reshape(-1, 2).astype(np.int64)
+    out = ((pairs @ K.T) % modulus).astype(np.uint8)
+    table = out.view(np.uint16).reshape(-1)
+    table.flags.writeable = False
+    return table
 
 
 # ---------- Hill for byte streams ----------
+_TABLE_HIT = KEY_CACHE.labels("image", "hit")
+_TABLE_MISS = KEY_CACHE.labels("image", "miss")
+# Pair tables by (key, modulus), least recently used first
+_pair_tables = {}
+_PAIR_TABLES_MAX = 16
+_pair_tables_lock = threading.Lock()
+
+
+def _pair_table(key: tuple, modulus: int) -> np.ndarray:
+    """Cached _build_pair_table, counting key-cache hits and misses."""
+    with _pair_tables_lock:
+        table = _pair_tables.pop((key, modulus), None)
+        if table is None:
+            _TABLE_MISS.inc()
+            table = _build_pair_table(key, modulus)
+            if len(_pair_tables) >= _PAIR_TABLES_MAX:
+                del _pair_tables[next(iter(_pair_tables))]
+        else:
+            _TABLE_HIT.inc()
+        _pair_tables[key, modulus] = table
+    return table
+
+
+def _nbytes_in(hill, data, *args, **kwargs) -> int:
+    return data.nbytes if isinstance(data, RawTiles) else np.asarray(data).nbytes
+
+
+def _nbytes_out(result) -> int:
+    return result.nbytes
+
+
 class Hill:
-    def __init__(self, key: np.ndarray | None = None, modulus: int = 256):
-        self._key = np.array([[3, 3], [2, 5]], dtype=int) if key is None else np.array(key, dtype=int)
+    def __init__(self, key: np.ndarray | StructuredKey | None = None, modulus: int = 256):
         self.modulus = modulus
+        if isinstance(key, StructuredKey):
+            # Circulant/permutation keys: blocks are transformed by FFT convolution
+            if key.modulus != modulus:
+                raise ValueError(f"Structured key modulus {key.modulus} does not match {modulus}")
+            self._key = key
+            self._inv = key.inverse()
+        else:
+            self._key = np.array([[3, 3], [2, 5]], dtype=int) if key is None else np.array(key, dtype=int)
+            self._inv = mod_matrix_inv(self._key, modulus)
         self.n = self._key.shape[0]
-        self._inv = mod_matrix_inv(self._key, modulus)
+        self._float_keys = {}
 
     def _blocks(self, data: np.ndarray) -> tuple[np.ndarray, int]:
-        flat = data.reshape(-1).astype(int)
+        """Row-major (m, n) int64 blocks; upcast and zero padding share one copy."""
+        flat = data.reshape(-1)
         L = flat.size
         pad = (-L) % self.n
         if pad:
-            flat = np.pad(flat, (0, pad), mode="constant")
+            blocks = np.zeros(L + pad, dtype=np.int64)
+            blocks[:L] = flat
             print(f"Padding applied: added {pad} zero(s) to match block size.")
-        m = flat.size // self.n
-        return flat.reshape(m, self.n).T, L
+        else:
+            blocks = flat.astype(np.int64)
+        return blocks.reshape(-1, self.n), L
 
     def _unblocks(self, arr: np.ndarray, orig_len: int) -> np.ndarray:
-        out = arr.T.reshape(-1)[:orig_len]
-        return out.astype(np.uint8)
-
-    def encode(self, data: np.ndarray, verbose=False) -> np.ndarray:
+        return arr.reshape(-1)[:orig_len].astype(np.uint8)
+
+    def _fused(self, matrix) -> bool:
+        """Whether the compiled single-pass kernel handles this key (see utils.kernels)."""
+        return fused() and not isinstance(matrix, StructuredKey)
+
+    def _table(self, matrix: np.ndarray) -> np.ndarray | None:
+        if self.n != 2 or self.modulus != 256 or isinstance(matrix, StructuredKey):
+            return None
+        return _pair_table(tuple(matrix.reshape(-1).tolist()), self.modulus)
+
+    def _lookup(self, data: np.ndarray, table: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        """2x2 byte fast path: one gather over the buffer viewed as uint16 pairs."""
+        flat = np.ascontiguousarray(data).reshape(-1)
+        out = np.empty_like(flat)
+        even = flat.size & ~1
+        np.take(table, flat[:even].view(np.uint16), out=out[:even].view(np.uint16), mode="clip")
+        if even < flat.size:
+            print("Padding applied: added 1 zero(s) to match block size.")
+            out[-1] = (int(matrix[0, 0]) * int(flat[-1])) % self.modulus
+        return out
+
+    def _transform(self, matrix, X: np.ndarray) -> np.ndarray:
+        """K x mod m for every row x of X, i.e. (X @ K.T) mod m."""
+        if isinstance(matrix, StructuredKey):
+            return matrix.apply(X)
+        return mod_matmul(X, matrix.T, self.modulus)
+
+    def _apply(self, matrix, data: np.ndarray) -> np.ndarray:
+        if self._fused(matrix):
+            return hill_rows(data, matrix, self.modulus)
+        table = self._table(matrix) if data.dtype == np.uint8 else None
+        if table is not None:
+            return self._lookup(data, table, matrix)
         B, L = self._blocks(data)
-        encrypted_blocks = (self._key @ B) % self.modulus
-        if verbose:
-            for i in range(B.shape[1]):
-                print(f"\nBlock {i+1}:")
-                print("Input vector:\n", B[:, i])
-                print("Key matrix:\n", self._key)
-                print("Multiplication result:\n", (self._key @ B[:, i]))
-                print("After mod", self.modulus, ":\n", encrypted_blocks[:, i])
+        return self._unblocks(self._transform(matrix, B), L)
+
+    def plan(self, data: np.ndarray, max_memory=None) -> Plan:
+        """Execution plan for encoding/decoding data within max_memory (e.g. "512MB")."""
+        data = np.asarray(data)
+        lookup = data.dtype == np.uint8 and self.n == 2 and self.modulus == 256 and not isinstance(self._key, StructuredKey)
+        stages = () if self._fused(self._key) else ("pair_index",) if lookup else ("upcast", "product")
+        per_sample = working_set(data.dtype, self.n, stages, out_dtype=np.uint8)
+        # Chunks only hold intermediates; the input and the output buffer stay resident
+        return make_plan(data.size, self.n, max_memory, per_sample,
+                         streaming_per_sample=per_sample, streaming_fixed=data.nbytes + data.size)
+
+    def _run(self, matrix, data: np.ndarray, max_memory=None) -> np.ndarray:
+        plan = self.plan(data, max_memory)
+        if plan.strategy == "in-memory":
+            return self._apply(matrix, data)
+        flat = data.reshape(-1)
+        out = np.empty(flat.size, dtype=np.uint8)
+        step = plan.chunk_blocks * self.n
+        for start in range(0, flat.size, step):
+            out[start:start + step] = self._apply(matrix, flat[start:start + step])
+        return out
+
+    @instrument("image", "encode", size_in=_nbytes_in, size_out=_nbytes_out)
+    def encode(self, data: np.ndarray, verbose=False, max_memory=None) -> np.ndarray:
+        if not verbose:
+            return self._run(self._key, data, max_memory)
+        B, L = self._blocks(data)
+        encrypted_blocks = self._transform(self._key, B)
+        for i in range(len(B)):
+            print(f"\nBlock {i+1}:")
+            print("Input vector:\n", B[i])
+            print("Key matrix:\n", self._key)
+            print("Multiplication result:\n", (self._key @ B[i]))
+            print("After mod", self.modulus, ":\n", encrypted_blocks[i])
         return self._unblocks(encrypted_blocks, L)
 
-    def decode(self, data: np.ndarray, verbose=False) -> np.ndarray:
+    @instrument("image", "decode", size_in=_nbytes_in, size_out=_nbytes_out)
+    def decode(self, data: np.ndarray, verbose=False, max_memory=None) -> np.ndarray:
+        if not verbose:
+            return self._run(self._inv, data, max_memory)
         B, L = self._blocks(data)
-        decrypted_blocks = (self._inv @ B) % self.modulus
-        if verbose:
-            for i in range(B.shape[1]):
-                print(f"\nBlock {i+1}:")
-                print("Encrypted vector:\n", B[:, i])
-                print("Inverse key matrix:\n", self._inv)
-                print("Multiplication result:\n", (self._inv @ B[:, i]))
-                print("After mod", self.modulus, ":\n", decrypted_blocks[:, i])
+        decrypted_blocks = self._transform(self._inv, B)
+        for i in range(len(B)):
+            print(f"\nBlock {i+1}:")
+            print("Encrypted vector:\n", B[i])
+            print("Inverse key matrix:\n", self._inv)
+            print("Multiplication result:\n", (self._inv @ B[i]))
+            print("After mod", self.modulus, ":\n", decrypted_blocks[i])
         return self._unblocks(decrypted_blocks, L)
 
+    # ---------- Preallocated outputs ----------
+    def _float_key(self, matrix):
+        """(K mod m).T as float64 if every product sum is exact in a double, else None."""
+        if isinstance(matrix, StructuredKey):
+            return None
+        m = self.modulus
+        if self.n * (m - 1) * max(m - 1, 255) >= 2 ** 53:
+            return None
+        cached = self._float_keys.get(id(matrix))
+        if cached is None or cached[0] is not matrix:
+            cached = self._float_keys[id(matrix)] = (matrix, np.ascontiguousarray((matrix % m).T, dtype=np.float64))
+        return cached[1]
+
+    def _into(self, matrix, src: np.ndarray, out: np.ndarray, workspace) -> np.ndarray:
+        if out.dtype != np.uint8 or out.size != src.size or not out.flags.c_contiguous:
+            raise ValueError("out must be a C-contiguous uint8 array with as many elements as src")
+        flat, dest = src.reshape(-1), out.reshape(-1)
+        L = flat.size
+        if self._fused(matrix):
+            hill_rows(flat, matrix, self.modulus, dest)
+            return out
+        workspace = workspace or HillWorkspace()
+        table = self._table(matrix) if src.dtype == np.uint8 and src.flags.c_contiguous else None
+        if table is not None:
+            even = L & ~1
+            # Widen the uint16 pairs into a reused index buffer so np.take does not convert them
+            idx = workspace.indices(even // 2)
+            np.copyto(idx, flat[:even].view(np.uint16))
+            np.take(table, idx, out=dest[:even].view(np.uint16), mode="clip")
+            if even < L:
+                dest[-1] = (int(matrix[0, 0]) * int(flat[-1])) % self.modulus
+            return out
+        KT = self._float_key(matrix)
+        if KT is None:
+            dest[:] = self._apply(matrix, flat)
+            return out
+        X, P = workspace.buffers(-(-L // self.n), self.n)
+        # src is fully read into X before out is written, so out may alias src
+        Xf = X.reshape(-1)
+        np.copyto(Xf[:L], flat, casting="unsafe")
+        Xf[L:] = 0
+        np.matmul(X, KT, out=P)
+        # Reduce as int64 in X's memory (fmod is slow on large values); mod 256 is the uint8 wrap
+        R = Xf.view(np.int64)
+        np.copyto(R, P.reshape(-1), casting="unsafe")
+        if self.modulus != 256:
+            np.remainder(R, self.modulus, out=R)
+        np.copyto(dest, R[:L], casting="unsafe")
+        return out
+
+    @instrument("image", "encode_into", size_in=_nbytes_in, size_out=_nbytes_out)
+    def encode_into(self, src: np.ndarray, out: np.ndarray, workspace: "HillWorkspace | None" = None) -> np.ndarray:
+        """encode() into a preallocated uint8 buffer (which may be src itself).
+
+        With a reused workspace, same-shaped inputs are encoded without any
+        new array allocations; structured keys still allocate in the FFT.
+        """
+        return self._into(self._key, src, out, workspace)
+
+    @instrument("image", "decode_into", size_in=_nbytes_in, size_out=_nbytes_out)
+    def decode_into(self, src: np.ndarray, out: np.ndarray, workspace: "HillWorkspace | None" = None) -> np.ndarray:
+        """decode() into a preallocated uint8 buffer (which may be src itself)."""
+        return self._into(self._inv, src, out, workspace)
+
+
+class HillWorkspace:
+    """Scratch buffers reused across encode_into/decode_into calls; grown on demand."""
+
+    def __init__(self):
+        self._blocks = np.empty(0, dtype=np.float64)
+        self._product = np.empty(0, dtype=np.float64)
+        self._indices = np.empty(0, dtype=np.intp)
+
+    def indices(self, size: int) -> np.ndarray:
+        if self._indices.size < size:
+            self._indices = np.empty(size, dtype=np.intp)
+        return self._indices[:size]
+
+    def buffers(self, num_blocks: int, n: int) -> tuple[np.ndarray, np.ndarray]:
+        size = num_blocks * n
+        if self._blocks.size < size:
+            self._blocks = np.empty(size, dtype=np.float64)
+            self._product = np.empty(size, dtype=np.float64)
+        return self._blocks[:size].reshape(num_blocks, n), self._product[:size].reshape(num_blocks, n)
+
+
+class HillCascade(Hill):
+    """Several Hill rounds fused into one pass.
+
+    Round i multiplies each block by keys[i], then optionally reorders the
+    block's positions with perms[i] (x -> x[perm]). The rounds compose into a
+    single key K = P_r K_r ... P_1 K_1 mod m, so encode/decode cost the same
+    as one Hill pass however many rounds are configured.
+    """
+    def __init__(self, keys, perms=None, modulus: int = 256):
+        keys = [np.array(k, dtype=np.int64) % modulus for k in keys]
+        if not keys:
+            raise ValueError("HillCascade needs at least one key")
+        n = keys[0].shape[0]
+        composed = np.eye(n, dtype=np.int64)
+        for i, key in enumerate(keys):
+            if key.shape != (n, n):
+                raise ValueError(f"Key {i} has shape {key.shape}, expected {(n, n)}")
+            mod_matrix_inv(key, modulus)  # every round must be invertible on its own
+            composed = mod_matmul(key, composed, modulus)
+            if perms is not None and i < len(perms) and perms[i] is not None:
+                composed = composed[np.asarray(perms[i])]
+        super().__init__(composed, modulus)
+        self.rounds = len(keys)
+
+
+def rekey(data: np.ndarray, old_key, new_key, modulus: int = 256, max_memory=None) -> np.ndarray:
+    """Re-encrypt data encoded with old_key so it is encoded with new_key.
+
+    Applies the single transition K_new @ K_old^-1 mod m (chunked under
+    max_memory), so there is one pass and no plaintext copy. Only a
+    zero-padded partial last block goes through decode/encode, to match
+    the truncation a plain decode + encode would apply.
+    """
+    old, new = Hill(old_key, modulus), Hill(new_key, modulus)
+    if old.n != new.n:
+        raise ValueError(f"Key sizes differ: {old.n} vs {new.n}")
+    transition = Hill(key_product(new._key, old._inv, modulus), modulus)
+    flat = np.asarray(data).reshape(-1)
+    full = flat.size // old.n * old.n
+    out = np.empty(flat.size, dtype=np.uint8)
+    out[:full] = transition.encode(flat[:full], max_memory=max_memory)
+    if full < flat.size:
+        out[full:] = new.encode(old.decode(flat[full:]))
+    return out
+
+
+class DeltaEncoder:
+    """Re-encrypts only the parts of an image that changed since the last call.
+
+    Hill blocks are independent, so changed blocks can be re-encoded alone
+    and spliced into the previous output. Changes are found by hashing
+    groups of group_blocks blocks, or given directly as a dirty rectangle
+    (top, left, bottom, right) in pixels. encode() returns the encoded
+    image (a buffer reused across calls) and the number of blocks touched.
+    """
+    def __init__(self, hill: Hill, group_blocks: int = 32768):
+        self.hill = hill
+        self.group = group_blocks * hill.n
+        self.encoded = None
+        self._shape = None
+        self._hashes = None
+
+    def _hash(self, flat: np.ndarray, g: int) -> bytes:
+        return hashlib.blake2b(flat[g * self.group:(g + 1) * self.group].tobytes(), digest_size=16).digest()
+
+    def _rect_blocks(self, dirty, num_blocks: int) -> np.ndarray:
+        top, left, bottom, right = dirty
+        h, w = self._shape[:2]
+        c = int(np.prod(self._shape[2:], dtype=np.int64))
+        rows = np.arange(max(top, 0), min(bottom, h))
+        starts = (rows * w + max(left, 0)) * c // self.hill.n
+        ends = -(-((rows * w + min(right, w)) * c) // self.hill.n)
+        # Difference array: +1 where a row's block range starts, -1 after it ends
+        marks = np.zeros(num_blocks + 1, dtype=np.int64)
+        np.add.at(marks, starts, 1)
+        np.add.at(marks, ends, -1)
+        return np.cumsum(marks[:-1]) > 0
+
+    def encode(self, image: np.ndarray, dirty=None) -> tuple[np.ndarray, int]:
+        image = np.asarray(image)
+        flat = np.ascontiguousarray(image).reshape(-1)
+        n = self.hill.n
+        num_blocks = -(-flat.size // n)
+        num_groups = -(-flat.size // self.group)
+        if self.encoded is None or image.shape != self._shape:
+            self._shape = image.shape
+            self.encoded = self.hill.encode(flat)
+            self._hashes = [self._hash(flat, g) for g in range(num_groups)]
+            return self.encoded.reshape(image.shape), num_blocks
+
+        if dirty is None:
+            changed = [g for g in range(num_groups) if self._hash(flat, g) != self._hashes[g]]
+            touched = np.zeros(num_blocks, dtype=bool)
+            for g in changed:
+                touched[g * self.group // n:(g + 1) * self.group // n] = True
+        else:
+            touched = self._rect_blocks(dirty, num_blocks)
+
+        # Re-encode each contiguous run of touched blocks in one call
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], touched.view(np.int8), [0]))))
+        for a, b in zip(edges[::2], edges[1::2]):
+            self.encoded[a * n:b * n] = self.hill._apply(self.hill._key, flat[a * n:b * n])
+        for g in np.unique(np.flatnonzero(touched) * n // self.group):
+            self._hashes[g] = self._hash(flat, g)
+        return self.encoded.reshape(image.shape), int(touched.sum())
+
+
+# ---------- Files ----------
+def _file_size(path: str, *args, **kwargs) -> int:
+    return os.path.getsize(path)
+
+
+# PIL modes already stored as uint8 samples, by channel count
+_NATIVE_MODES = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}
+
+
+def image_to_array(img: Image.Image) -> np.ndarray:
+    """uint8 (H, W[, C]) pixels of a PIL image in a single copy.
+
+    L, LA, RGB and RGBA images are used as decoded; other modes (palette,
+    16-bit, CMYK, ...) are converted to RGB. The result is read-only.
+    """
+    if img.mode not in _NATIVE_MODES.values():
+        img = img.convert("RGB")
+    return np.asarray(img)
+
+
+def array_to_image(arr: np.ndarray) -> Image.Image:
+    """PIL image sharing the memory of a uint8 (H, W[, C]) array."""
+    arr = np.ascontiguousarray(arr, dtype=np.uint8)
+    mode = _NATIVE_MODES[arr.shape[2] if arr.ndim == 3 else 1]
+    return Image.frombuffer(mode, (arr.shape[1], arr.shape[0]), arr, "raw", mode, 0, 1)
+
+
+def _load_pixels(path: str) -> np.ndarray | RawTiles:
+    """Pixels of an image file; .npy and uncompressed images are memory-mapped, not decoded."""
+    pixels = map_pixels(path)
+    if pixels is not None:
+        return pixels
+    with Image.open(path) as img:
+        return image_to_array(img)
+
+
+def _plan_input(arr: np.ndarray | RawTiles) -> np.ndarray:
+    """Stand-in for Hill.plan with arr's shape and dtype; the plan never touches the pixels."""
+    return np.broadcast_to(np.zeros((), dtype=arr.dtype), arr.shape)
+
+
+def _strip_rows(hill: Hill, arr: np.ndarray | RawTiles, max_memory) -> int:
+    """Rows per pipelined strip: a multiple of the block size that fits the plan."""
+    row = int(np.prod(arr.shape[1:]))
+    rows = max(STRIP_BYTES // row, 1)
+    plan = hill.plan(_plan_input(arr), max_memory)
+    if plan.strategy == "streaming":
+        rows = min(rows, plan.chunk_blocks * hill.n // row)
+    return max(rows // hill.n, 1) * hill.n
+
+
+def _open_npy_output(out_path: str, shape: tuple, resume: bool) -> np.memmap:
+    """Preallocated uint8 .npy output, reopened when resuming and still the right shape."""
+    if resume and os.path.exists(out_path):
+        try:
+            out = np.load(out_path, mmap_mode="r+")
+            if out.shape == shape and out.dtype == np.uint8:
+                return out
+        except ValueError:
+            pass
+    return np.lib.format.open_memmap(out_path, mode="w+", dtype=np.uint8, shape=shape)
+
+
+def _run_job(hill: Hill, op: str, path: str, arr: np.ndarray, out_path: str, step: int, observe=None):
+    """Strip-by-strip transform into a .npy with a checkpoint journal; resumes after verified strips."""
+    matrix = hill._key if op == "encode" else hill._inv
+    st = os.stat(path)
+    params = {"op": op, "input": [os.path.abspath(path), st.st_size, st.st_mtime_ns],
+              "key": key_fingerprint(hill._key, hill.modulus).hex(), "strip_rows": step,
+              "output": os.path.abspath(out_path)}
+    journal = ChunkJournal(out_path + ".journal", params)
+    out = _open_npy_output(out_path, arr.shape, bool(journal.digests))
+
+    def rows(k):
+        return out[k * step:(k + 1) * step]
+    start = journal.resume(lambda k: chunk_digest(rows(k)))
+    if start:
+        print(f"Resuming after {start} verified strip(s)")
+    for k in range(start if observe is not None else 0):
+        observe(rows(k))
+
+    def write(result):
+        k, strip = result
+        rows(k)[...] = strip.reshape(rows(k).shape)
+        out.flush()
+        journal.commit(k, chunk_digest(rows(k)))
+
+    def observe_strip(result):
+        observe(result[1])
+
+    strips = ((k, arr[k * step:(k + 1) * step]) for k in range(start, -(-len(arr) // step)))
+    times = run_pipeline(strips, lambda c: (c[0], hill._apply(matrix, c[1].reshape(-1))), write,
+                         observe=None if observe is None else observe_strip)
+    record_pipeline("image", op, times)
+    out.flush()
+    journal.finish()
+
+
+def _transform_file(hill: Hill, op: str, path: str, out_path: str | None, max_memory, cache,
+                    resumable: bool, fmt: str | None, quality: QualityAnalyzer | None = None,
+                    preview: "StripThumbnail | None" = None) -> str:
+    default_fmt = "npy" if resumable else ENCRYPTED_FORMAT if op == "encode" else DECRYPTED_FORMAT
+    fmt = fmt or (format_for(out_path) if out_path else default_fmt)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown image format {fmt!r}; choose from {', '.join(FORMATS)}")
+    if resumable and fmt != "npy":
+        raise ValueError("Resumable image jobs write a preallocated .npy output")
+    suffix = "-encoded" if op == "encode" else "-decoded"
+    out_path = out_path or os.path.splitext(path)[0] + suffix + FORMATS[fmt][0]
+    matrix = hill._key if op == "encode" else hill._inv
+    observers = [stage.update for stage in (quality, preview) if stage is not None]
+    produced = []
+
+    def observe(strip):
+        for update in observers:
+            update(strip)
+
+    def produce():
+        produced.append(True)
+        arr = _load_pixels(path)
+        step = _strip_rows(hill, arr, max_memory)
+        channels = arr.shape[2] if arr.ndim == 3 else 1
+        if quality is not None:
+            quality.bind(hill.modulus, channels)
+        if preview is not None:
+            preview.start(arr.shape)
+        if resumable:
+            _run_job(hill, op, path, arr, out_path, step, observe if observers else None)
+            return out_path
+        # Strips start on block boundaries, so only the last one can need padding
+        strips = (arr[r:r + step] for r in range(0, len(arr), step))
+        with open_writer(out_path, arr.shape[0], arr.shape[1], channels, fmt) as writer:
+            times = run_pipeline(strips, lambda strip: hill._apply(matrix, strip.reshape(-1)), writer.write_rows,
+                                 observe=observe if observers else None)
+        record_pipeline("image", op, times)
+        return out_path
+    if cache is None:
+        return produce()
+    name = cache_key(path, hill._key, hill.modulus, f"image/{op}/native/{fmt}")
+    out_path = cache.fetch(name, FORMATS[fmt][0], out_path, produce)
+    if quality is not None and not produced:
+        analyze_image(out_path, quality)
+    return out_path
+
+
+@instrument("image", "encrypt_file", size_in=_file_size, size_out=_file_size)
+def encrypt_image_file(path: str, hill: Hill, out_path: str | None = None, max_memory=None,
+                       cache: OutputCache | None = None, resumable=False, fmt: str | None = None,
+                       quality: QualityAnalyzer | None = None, preview: "StripThumbnail | None" = None) -> str:
+    """Encrypt an image file and return the output path (default <name>-encoded.<ext>).
+
+    fmt is one of utils.image_io.FORMATS ("png", "png0", "tiff", "npy");
+    it defaults to the out_path extension, else to the uncompressed
+    ENCRYPTED_FORMAT, since ciphertext does not compress. Row strips are
+    encoded while earlier ones are being written. With a cache, an
+    identical input and key returns the stored output without encoding it
+    again. resumable=True writes a .npy with a checkpoint journal, so an
+    interrupted job continues after its last verified strip. A
+    QualityAnalyzer passed as quality sees every encrypted strip as it is
+    written (a cached output is scanned instead). A StripThumbnail passed
+    as preview is built from the same strips, so showing the result needs
+    no second read of the output file; it stays empty on a cache hit.
+    """
+    return _transform_file(hill, "encode", path, out_path, max_memory, cache, resumable, fmt, quality, preview)
+
+
+@instrument("image", "decrypt_file", size_in=_file_size, size_out=_file_size)
+def decrypt_image_file(path: str, hill: Hill, out_path: str | None = None, max_memory=None,
+                       cache: OutputCache | None = None, resumable=False, fmt: str | None = None,
+                       preview: "StripThumbnail | None" = None) -> str:
+    """Decrypt an image file and return the output path (default <name>-decoded.png)."""
+    return _transform_file(hill, "decode", path, out_path, max_memory, cache, resumable, fmt, preview=preview)
+
+
+@lru_cache(maxsize=None)
+def _gui_cache() -> OutputCache:
+    return OutputCache(cipher="image")
+
+
+# ---------- Previews ----------
+THUMB_SIZE = (300, 300)
+
+
+@lru_cache(maxsize=64)
+def _load_thumbnail(path: str, mtime_ns: int, size: tuple) -> Image.Image:
+    if path.lower().endswith(".npy"):
+        return thumbnail_from_array(np.load(path, mmap_mode="r"), size)
+    with Image.open(path) as img:
+        img.draft("RGB", size)  # JPEG: let the decoder downscale by up to 8x
+        img.thumbnail(size, reducing_gap=2.0)
+        return img.convert("RGB")
+
+
+def thumbnail_from_path(path: str, size: tuple = THUMB_SIZE) -> Image.Image:
+    """Preview of an image file, cached by path and modification time."""
+    path = os.path.abspath(path)
+    return _load_thumbnail(path, os.stat(path).st_mtime_ns, tuple(size))
+
+
+def thumbnail_from_array(arr: np.ndarray, size: tuple = THUMB_SIZE) -> Image.Image:
+    """Preview of an in-memory (H, W[, C]) uint8 array by strided decimation."""
+    h, w = arr.shape[:2]
+    step = max(1, min(h // size[1], w // size[0]))
+    img = array_to_image(arr[::step, ::step])
+    img.thumbnail(size)
+    return img.convert("RGB")
+
+
+class StripThumbnail:
+    """Thumbnail of an image assembled from its strips as they are produced.
+
+    Only every step-th row and column is kept (the decimation
+    thumbnail_from_array applies), so the full result never has to be
+    held in memory or read back from disk.
+    """
+
+    def __init__(self, size: tuple = THUMB_SIZE):
+        self.size = size
+        self._rows = []
+
+    def start(self, shape: tuple):
+        h, w = shape[:2]
+        self._shape = tuple(shape[1:])
+        self._step = max(1, min(h // self.size[1], w // self.size[0]))
+        self._next = 0
+        self._rows = []
+
+    def update(self, strip: np.ndarray):
+        rows = np.asarray(strip).reshape((-1,) + self._shape)
+        first = (-self._next) % self._step
+        self._rows.append(rows[first::self._step, ::self._step].copy())
+        self._next += len(rows)
+
+    def image(self) -> Image.Image | None:
+        """The preview, or None if no strips were produced (e.g. on a cache hit)."""
+        return thumbnail_from_array(np.concatenate(self._rows), self.size) if self._rows else None
+
 
 # ---------- Shared helper ----------
-def _show_image(label: tk.Label, path: str):
-    img = Image.open(path).convert("RGB")
-    img.thumbnail((300, 300))
+def _show_thumbnail(label: tk.Label, img: Image.Image):
     tkimg = ImageTk.PhotoImage(img)
     label.config(image=tkimg)
     label.image = tkimg
 
 
+def _show_image(label: tk.Label, path: str):
+    _show_thumbnail(label, thumbnail_from_path(path))
+
+
+def _show_result(label: tk.Label, preview: StripThumbnail, out_path: str):
+    """Show a freshly produced result from its strips; a cached one from the stored file."""
+    img = preview.image()
+    if img is None:
+        _show_image(label, out_path)
+    else:
+        _show_thumbnail(label, img)
+
+
 def create_styled_button(parent, text, command, color, width=15):
     """Create a styled button with hover effects"""
     btn = tk.Button(parent, text=text, command=command,
@@ -193,7 +753,13 @@ def run_encoder(parent: tk.Misc | None = None):
     
     tk.Label(key_frame, text="💡 Format: row1val1,row1val2;row2val1,row2val2",
              font=('Segoe UI', 8),  # Smaller font
-             fg='#78909c', bg='#16213e').pack(pady=(0, 10))  # Reduced padding
+             fg='#78909c', bg='#16213e').pack(pady=(0, 4))  # Reduced padding
+
+    # Output format: uncompressed formats skip zlib work on incompressible ciphertext
+    fmt_var = tk.StringVar(value=ENCRYPTED_FORMAT)
+    fmt_menu = tk.OptionMenu(key_frame, fmt_var, *FORMATS)
+    fmt_menu.config(font=('Segoe UI', 8), bg='#263238', fg='white', highlightthickness=0)
+    fmt_menu.pack(pady=(0, 10))
 
     # State management
     state = {"path": None, "shape": None, "arr": None, "key": Hill()}
@@ -209,13 +775,12 @@ def run_encoder(parent: tk.Misc | None = None):
 
     def pick_image():
         path = filedialog.askopenfilename(parent=window, title="Select an Image",
-                                        filetypes=[("Image files", "*.png *.jpg *.jpeg *.bmp *.tiff"),
+                                        filetypes=[("Image files", "*.png *.jpg *.jpeg *.bmp *.tif *.tiff *.npy"),
                                                  ("All files", "*.*")])
         if not path: 
             return
         try:
-            pil = Image.open(path).convert("RGB")
-            arr = np.array(pil, dtype=np.uint8)
+            arr = _load_pixels(path)
             state.update({"path": path, "shape": arr.shape, "arr": arr})
             _show_image(lbl_original, path)
         except Exception as e:
@@ -228,10 +793,11 @@ def run_encoder(parent: tk.Misc | None = None):
         if not parse_key(): 
             return
         try:
-            enc = state["key"].encode(state["arr"].reshape(-1)).reshape(state["shape"])
-            out_path = os.path.splitext(state["path"])[0] + "-encoded.png"
-            imageio.imwrite(out_path, enc)
-            _show_image(lbl_encoded, out_path)
+            print(f"Plan: {state['key'].plan(_plan_input(state['arr']), MAX_MEMORY)}")
+            preview = StripThumbnail()
+            out_path = encrypt_image_file(state["path"], state["key"], max_memory=MAX_MEMORY, cache=_gui_cache(),
+                                          fmt=fmt_var.get(), preview=preview)
+            _show_result(lbl_encoded, preview, out_path)
             messagebox.showinfo("Success", f"Encoded image saved:\n{out_path}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to encrypt image:\n{str(e)}")
@@ -344,13 +910,12 @@ def run_decoder(parent: tk.Misc | None = None):
 
     def pick_image():
         path = filedialog.askopenfilename(parent=window, title="Select an Encoded Image",
-                                        filetypes=[("Image files", "*.png *.jpg *.jpeg *.bmp *.tiff"),
+                                        filetypes=[("Image files", "*.png *.jpg *.jpeg *.bmp *.tif *.tiff *.npy"),
                                                  ("All files", "*.*")])
         if not path: 
             return
         try:
-            pil = Image.open(path).convert("RGB")
-            arr = np.array(pil, dtype=np.uint8)
+            arr = _load_pixels(path)
             state.update({"path": path, "shape": arr.shape, "arr": arr})
             _show_image(lbl_encoded, path)
         except Exception as e:
@@ -363,10 +928,11 @@ def run_decoder(parent: tk.Misc | None = None):
         if not parse_key(): 
             return
         try:
-            dec = state["key"].decode(state["arr"].reshape(-1)).reshape(state["shape"])
-            out_path = os.path.splitext(state["path"])[0] + "-decoded.png"
-            imageio.imwrite(out_path, dec)
-            _show_image(lbl_decoded, out_path)
+            print(f"Plan: {state['key'].plan(_plan_input(state['arr']), MAX_MEMORY)}")
+            preview = StripThumbnail()
+            out_path = decrypt_image_file(state["path"], state["key"], max_memory=MAX_MEMORY, cache=_gui_cache(),
+                                          preview=preview)
+            _show_result(lbl_decoded, preview, out_path)
             messagebox.showinfo("Success", f"Decoded image saved:\n{out_path}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to decrypt image:\n{str(e)}")
@@ -0,0 +1,121 @@
+"""Known-plaintext key recovery, used to audit Hill keys.
+
+Given leaked plaintext/ciphertext blocks, any n blocks whose plaintext
+matrix is invertible mod m reveal the key: C = K @ P  =>  K = C @ P^-1.
+Candidate block subsets are solved in batches with the exact modular
+solver, so large keys and thousands of offsets stay cheap.
+
+    python -m hill.key_audit            # time-to-recover benchmark
+"""
+import time
+import numpy as np
+from utils.matrix_utils import batch_mod_inv
+from hill.text_cipher import letter_to_index, modulus as TEXT_MODULUS
+
+
+# ---------- Block pairs ----------
+def block_pairs(plain, cipher, n: int) -> tuple[np.ndarray, np.ndarray]:
+    """Row-blocks (N, n) of matching plaintext/ciphertext symbols."""
+    plain = np.asarray(plain, dtype=np.int64).reshape(-1)
+    cipher = np.asarray(cipher, dtype=np.int64).reshape(-1)
+    L = min(plain.size, cipher.size) // n * n
+    return plain[:L].reshape(-1, n), cipher[:L].reshape(-1, n)
+
+
+def text_pairs(plaintext: str, ciphertext: str, n: int) -> tuple[np.ndarray, np.ndarray]:
+    """Block pairs for text_cipher messages (symbols outside the alphabet are dropped, as in encrypt)."""
+    plain = [letter_to_index[ch] for ch in plaintext if ch in letter_to_index]
+    plain += [letter_to_index[" "]] * ((-len(plain)) % n)
+    cipher = [letter_to_index[ch] for ch in ciphertext if ch in letter_to_index]
+    return block_pairs(plain, cipher, n)
+
+
+def _candidates(num_blocks: int, n: int, count: int, rng) -> np.ndarray:
+    """Block index subsets (count, n): contiguous offsets first, then random picks."""
+    offsets = np.arange(max(num_blocks - n + 1, 0))[:count]
+    subsets = offsets[:, None] + np.arange(n)
+    extra = count - len(subsets)
+    if extra > 0:
+        picks = np.argsort(rng.random((extra, num_blocks)), axis=1)[:, :n]
+        subsets = np.concatenate([subsets, picks])
+    return subsets
+
+
+# ---------- Recovery ----------
+def recover_key(P: np.ndarray, C: np.ndarray, modulus: int,
+                candidates: int = 4096, batch: int = 256, seed: int = 0):
+    """Recover K (C = K @ P per block) from row-block pairs.
+
+    Returns (K, tried) where tried is the number of candidate subsets solved,
+    or (None, tried) if no candidate reproduces every ciphertext block.
+    """
+    P = np.asarray(P, dtype=np.int64) % modulus
+    C = np.asarray(C, dtype=np.int64) % modulus
+    N, n = P.shape
+    if N < n:
+        raise ValueError(f"Need at least {n} block pairs, got {N}")
+
+    rng = np.random.default_rng(seed)
+    subsets = _candidates(N, n, candidates, rng)
+    tried, size = 0, 8
+    while tried < len(subsets):
+        # Small first batches: a random plaintext matrix is usually invertible
+        idx = subsets[tried:tried + size]
+        size = min(size * 2, batch)
+        inv, ok = batch_mod_inv(P[idx], modulus)
+        tried += len(idx)
+        if not ok.any():
+            continue
+        # Rows: C_sub = P_sub @ K.T  =>  K.T = P_sub^-1 @ C_sub
+        Kt = (inv[ok] @ C[idx[ok]]) % modulus
+        for k in Kt:
+            if np.array_equal((P @ k) % modulus, C):
+                return k.T.copy(), tried
+    return None, tried
+
+
+def audit_key(key, modulus: int = 256, blocks: int | None = None, seed: int = 0) -> dict:
+    """Encrypt random plaintext with key and time how long recovery takes."""
+    K = np.asarray(key, dtype=np.int64) % modulus
+    n = K.shape[0]
+    rng = np.random.default_rng(seed)
+    P = rng.integers(0, modulus, size=(blocks or 2 * n, n), dtype=np.int64)
+    C = (P @ K.T) % modulus
+
+    t0 = time.perf_counter()
+    recovered, tried = recover_key(P, C, modulus, seed=seed)
+    elapsed = time.perf_counter() - t0
+    return {
+        "n": n,
+        "modulus": modulus,
+        "blocks": len(P),
+        "tried": tried,
+        "recovered": recovered is not None and np.array_equal(recovered, K),
+        "seconds": elapsed,
+    }
+
+
+def _random_key(n: int, modulus: int, rng) -> np.ndarray:
+    while True:
+        K = rng.integers(0, modulus, size=(n, n), dtype=np.int64)
+        _, ok = batch_mod_inv(K, modulus)
+        if ok:
+            return K
+
+
+def benchmark(sizes=(2, 4, 8, 16, 32, 64), moduli=(TEXT_MODULUS, 256), seed: int = 0):
+    """Print time-to-recover per key size and modulus."""
+    rng = np.random.default_rng(seed)
+    print(f"{'n':>4} {'mod':>6} {'blocks':>7} {'tried':>6} {'ok':>4} {'ms':>10}")
+    results = []
+    for m in moduli:
+        for n in sizes:
+            r = audit_key(_random_key(n, m, rng), m, seed=seed)
+            results.append(r)
+            print(f"{r['n']:>4} {r['modulus']:>6} {r['blocks']:>7} {r['tried']:>6} "
+                  f"{'yes' if r['recovered'] else 'no':>4} {r['seconds'] * 1e3:>10.2f}")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,13 +1,19 @@
 from typing import Self
+import base64
 import numpy as np
 import tkinter as tk
-from tkinter import messagebox, scrolledtext
+from tkinter import messagebox, scrolledtext, ttk
+from utils.metrics import instrument
+from utils.matrix_utils import mod_matmul
 
 alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 .,!?;:'\"-()[]{}<>@#$%^&*_+=/\\|`~"
 letter_to_index = {ch: i for i, ch in enumerate(alphabet)}
 index_to_letter = {i: ch for i, ch in enumerate(alphabet)}
 modulus = len(alphabet)
 
+# Symbols encrypted per GUI tick, so large pasted inputs never block the event loop
+CHUNK_SYMBOLS = 8192
+
 
 # ---------- Math helpers ----------
 def mod_inv(a, m):
@@ -36,6 +42,12 @@ def generate_key(n=3):
 
 
 # ---------- Cipher ----------
+def _utf8_len(text, *args, **kwargs) -> int:
+    """Size in bytes for the metrics: the UTF-8 length of a str, the length of bytes."""
+    return len(text.encode("utf-8")) if isinstance(text, str) else len(text)
+
+
+@instrument("text", "encrypt", size_in=_utf8_len, size_out=_utf8_len)
 def encrypt(message, K):
     message_numbers = [letter_to_index[ch] for ch in message if ch in letter_to_index]
 
@@ -50,7 +62,8 @@ def encrypt(message, K):
     return ciphertext
 
 
-def decrypt(cipher, Kinv):
+@instrument("text", "decrypt", size_in=_utf8_len, size_out=_utf8_len)
+def decrypt(cipher, Kinv, strip=True):
     cipher_numbers = [letter_to_index[ch] for ch in cipher if ch in letter_to_index]
 
     decrypted = ""
@@ -61,9 +74,48 @@ def decrypt(cipher, Kinv):
             block = np.vstack([block, [[letter_to_index[" "]]]])
 
         numbers = np.dot(Kinv, block) % modulus
-        decrypted += "".join(index_to_letter[int(num)] for num in numbers)
-
-    return decrypted.rstrip()
+        decrypted += "".join(index_to_letter[int(num.item())] for num in numbers)
+
+    return decrypted.rstrip() if strip else decrypted
+
+
+# ---------- Byte mode (UTF-8, modulus 256) ----------
+def _byte_blocks_transform(data: np.ndarray, M) -> np.ndarray:
+    n = M.shape[0]
+    blocks = data.reshape(-1, n)
+    return mod_matmul(blocks, np.asarray(M).T, 256).astype(np.uint8).reshape(-1)
+
+
+@instrument("text_bytes", "encrypt", size_in=_utf8_len, size_out=_utf8_len)
+def encrypt_bytes(message, K, as_base64=False):
+    """Encrypt any text losslessly: UTF-8 bytes through the Hill transform mod 256.
+
+    The message is padded PKCS#7-style (1..n bytes, each equal to the pad
+    length), so decrypt_bytes restores it exactly. Returns bytes, or an
+    ASCII base64 string for display when as_base64 is set.
+    """
+    data = message.encode("utf-8") if isinstance(message, str) else bytes(message)
+    n = K.shape[0]
+    if n > 255:
+        raise ValueError("Byte mode supports keys up to 255x255")
+    pad = n - len(data) % n
+    buf = np.frombuffer(data + bytes([pad]) * pad, dtype=np.uint8)
+    out = _byte_blocks_transform(buf, K).tobytes()
+    return base64.b64encode(out).decode("ascii") if as_base64 else out
+
+
+@instrument("text_bytes", "decrypt", size_in=_utf8_len, size_out=_utf8_len)
+def decrypt_bytes(cipher, Kinv) -> str:
+    """Inverse of encrypt_bytes; Kinv is the key inverse mod 256, cipher bytes or base64."""
+    data = base64.b64decode(cipher, validate=True) if isinstance(cipher, str) else bytes(cipher)
+    n = Kinv.shape[0]
+    if not data or len(data) % n:
+        raise ValueError(f"Ciphertext length {len(data)} is not a multiple of the block size {n}")
+    out = _byte_blocks_transform(np.frombuffer(data, dtype=np.uint8), Kinv)
+    pad = int(out[-1])
+    if not 1 <= pad <= n or (out[-pad:] != pad).any():
+        raise ValueError("Invalid padding: wrong key or corrupted ciphertext")
+    return out[:-pad].tobytes().decode("utf-8")
 
 
 def create_styled_button(parent, text, command, color, width=15):
@@ -266,9 +318,49 @@ def run(parent=None):
         except Exception as e:
             messagebox.showerror("Error", f"Failed to paste key:\n{str(e)}")
 
+    job = {"id": None}
+
+    def start_job(label, total, steps, finish):
+        """Drive steps (a generator yielding symbols done) from window.after ticks."""
+        if job["id"] is not None:
+            window.after_cancel(job["id"])
+        progress["value"] = 0
+
+        def tick():
+            try:
+                done = next(steps)
+            except StopIteration:
+                job["id"] = None
+                progress["value"] = 100
+                finish()
+                return
+            except Exception as e:
+                job["id"] = None
+                status_label.config(text=f"❌ {label} failed", fg='#f44336')
+                messagebox.showerror("Error", f"{label} failed:\n{str(e)}")
+                return
+            percent = 100 * min(done, total) / max(total, 1)
+            progress["value"] = percent
+            status_label.config(text=f"{label}... {percent:.0f}%", fg='#2196f3')
+            job["id"] = window.after(1, tick)
+
+        job["id"] = window.after(1, tick)
+
+    def chunk_size(n):
+        return max(n, CHUNK_SYMBOLS // n * n)
+
+    def insert_slices(text, *boxes):
+        """Steps that insert already-computed text in bounded slices."""
+        for start in range(0, len(text), CHUNK_SYMBOLS):
+            for box in boxes:
+                box.insert(tk.END, text[start:start + CHUNK_SYMBOLS])
+            yield start + CHUNK_SYMBOLS
+
     def encrypt_message():
-        msg = msg_box.get("1.0", tk.END).strip()
-        if not msg:
+        raw = byte_mode.get()
+        # Byte mode keeps the text exactly, including surrounding whitespace
+        msg = msg_box.get("1.0", "end-1c") if raw else msg_box.get("1.0", tk.END).strip()
+        if not msg.strip():
             messagebox.showerror("Error", "Enter a message to encrypt")
             return
         
@@ -280,21 +372,41 @@ def run(parent=None):
             if K.shape[0] != K.shape[1]:
                 raise ValueError("Key matrix must be square")
             
-            _ = matrix_mod_inv(K, modulus)
-            
-            cipher = encrypt(msg, K)
-            key_str_display = ";".join(",".join(str(x) for x in row) for row in K)
-
-            out_box.delete("1.0", tk.END)
-            out_box.insert(tk.END, f"Encryption successful!\n\nCiphertext:\n{cipher}\n\nKey used:\n{key_str_display}")
-
-            cipher_box.delete("1.0", tk.END)
-            cipher_box.insert(tk.END, cipher)
-            
+            _ = matrix_mod_inv(K, 256 if raw else modulus)
+            cipher = encrypt_bytes(msg, K, as_base64=True) if raw else None
         except Exception as e:
             messagebox.showerror("Error", f"Encryption failed:\n{str(e)}")
+            return
+
+        key_str_display = ";".join(",".join(str(x) for x in row) for row in K)
+        out_box.delete("1.0", tk.END)
+        out_box.insert(tk.END, "Encrypting...\n\nCiphertext:\n")
+        cipher_box.delete("1.0", tk.END)
+
+        # Drop unsupported symbols up front so every chunk stays block-aligned
+        symbols = "" if raw else "".join(ch for ch in msg if ch in letter_to_index)
+
+        def steps():
+            step = chunk_size(K.shape[0])
+            for start in range(0, len(symbols), step):
+                piece = encrypt(symbols[start:start + step], K)
+                out_box.insert(tk.END, piece)
+                cipher_box.insert(tk.END, piece)
+                yield start + step
+
+        def finish():
+            out_box.delete("1.0", "1.end")
+            out_box.insert("1.0", "Encryption successful!")
+            out_box.insert(tk.END, f"\n\nKey used:\n{key_str_display}")
+            status_label.config(text="✅ Encryption complete", fg='#4caf50')
+
+        if raw:
+            start_job("Encrypting", len(cipher), insert_slices(cipher, out_box, cipher_box), finish)
+        else:
+            start_job("Encrypting", len(symbols), steps(), finish)
 
     def decrypt_message():
+        raw = byte_mode.get()
         cipher = cipher_box.get("1.0", tk.END).strip()
         key_str = key_entry.get("1.0", "end-1c").strip()
 
@@ -305,15 +417,42 @@ def run(parent=None):
         try:
             rows = [[int(x.strip()) for x in r.split(",")] for r in key_str.split(";")]
             K = np.array(rows, dtype=int)
-            Kinv = matrix_mod_inv(K, modulus)
-            
-            plain = decrypt(cipher, Kinv)
-            out_box.delete("1.0", tk.END)
-            out_box.insert(tk.END, f"Decryption successful!\n\nPlaintext:\n{plain}")
+            Kinv = matrix_mod_inv(K, 256 if raw else modulus)
+            plain = decrypt_bytes("".join(cipher.split()), Kinv) if raw else None
         except Exception as e:
             messagebox.showerror("Error", f"Decryption failed:\n{str(e)}")
+            return
+
+        out_box.delete("1.0", tk.END)
+        out_box.insert(tk.END, "Decrypting...\n\nPlaintext:\n")
+
+        symbols = "" if raw else "".join(ch for ch in cipher if ch in letter_to_index)
+
+        def steps():
+            step = chunk_size(Kinv.shape[0])
+            pending = ""
+            for start in range(0, len(symbols), step):
+                # Hold back trailing spaces until more text follows: same result as one rstrip()
+                text = pending + decrypt(symbols[start:start + step], Kinv, strip=False)
+                body = text.rstrip()
+                pending = text[len(body):]
+                out_box.insert(tk.END, body)
+                yield start + step
+
+        def finish():
+            out_box.delete("1.0", "1.end")
+            out_box.insert("1.0", "Decryption successful!")
+            status_label.config(text="✅ Decryption complete", fg='#4caf50')
+
+        if raw:
+            start_job("Decrypting", len(plain), insert_slices(plain, out_box), finish)
+        else:
+            start_job("Decrypting", len(symbols), steps(), finish)
 
     def clear_all():
+        if job["id"] is not None:
+            window.after_cancel(job["id"])
+            job["id"] = None
         msg_box.delete("1.0", tk.END)
         cipher_box.delete("1.0", tk.END)
         out_box.delete("1.0", tk.END)
@@ -323,6 +462,13 @@ def run(parent=None):
     create_styled_button(key_btn_frame, "📋 Copy Key", copy_key, '#2196f3', 12).grid(row=0, column=1, padx=5)
     create_styled_button(key_btn_frame, "📌 Paste Key", paste_key, '#2196f3', 12).grid(row=0, column=2, padx=5)
 
+    # Byte mode: UTF-8 bytes mod 256 (any Unicode round-trips), base64 ciphertext
+    byte_mode = tk.BooleanVar(value=False)
+    tk.Checkbutton(key_btn_frame, text="UTF-8 byte mode", variable=byte_mode,
+                   font=('Segoe UI', 10, 'bold'),
+                   fg='white', bg='#16213e', selectcolor='#263238',
+                   activebackground='#16213e', activeforeground='white').grid(row=0, column=3, padx=5)
+
     # ROW 3: Action buttons
     btn_frame = tk.Frame(window, bg='#1a1a2e')
     btn_frame.grid(row=3, column=0, pady=20)
@@ -343,6 +489,9 @@ def run(parent=None):
                            fg='#4caf50', bg='#263238')
     status_label.grid(row=0, column=0, sticky='w', padx=15, pady=8)
 
+    progress = ttk.Progressbar(status_frame, mode='determinate', length=200, maximum=100)
+    progress.grid(row=0, column=1, sticky='e', padx=15, pady=8)
+
     if not parent:
         window.mainloop()
 
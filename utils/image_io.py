@@ -0,0 +1,296 @@
+"""Incremental image I/O: writers that accept row strips, memory-mapped readers.
+
+Encrypted images are close to white noise, so compressing them costs
+time and saves nothing. Besides PNG at any zlib level, outputs can be
+written as uncompressed TIFF or as raw .npy, which np.load can also
+memory-map. Uncompressed inputs are memory-mapped too (map_pixels), so
+images far larger than RAM are read one band at a time. Run
+python -m utils.image_io for write time and size per format.
+"""
+import os
+import zlib
+import struct
+from time import perf_counter
+import numpy as np
+
+# name -> (extension, writer options)
+FORMATS = {
+    "png": (".png", {"level": 6}),
+    "png0": (".png", {"level": 0}),    # stored deflate blocks: readable PNG, no compression work
+    "tiff": (".tiff", {}),
+    "npy": (".npy", {}),
+}
+ENCRYPTED_FORMAT = "tiff"     # ciphertext is incompressible: store it raw
+DECRYPTED_FORMAT = "png"
+
+_COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}   # channels -> PNG colour type (8-bit)
+
+
+def _chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(data, zlib.crc32(tag)))
+
+
+class PNGWriter:
+    """Write an 8-bit PNG strip by strip without holding the whole image.
+
+    Rows use filter type 0 and are deflated as they arrive; zlib releases
+    the GIL, so compression can overlap with work in other threads.
+    """
+
+    def __init__(self, path: str, height: int, width: int, channels: int = 3, level: int = 6):
+        self.shape = (width, channels)
+        self.rows_left = height
+        self._z = zlib.compressobj(level)
+        self._f = open(path, "wb")
+        self._f.write(b"\x89PNG\r\n\x1a\n")
+        self._f.write(_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, _COLOR_TYPES[channels], 0, 0, 0)))
+
+    def write_rows(self, rows: np.ndarray):
+        width, channels = self.shape
+        rows = np.asarray(rows, dtype=np.uint8).reshape(-1, width * channels)
+        if len(rows) > self.rows_left:
+            raise ValueError("More rows written than the PNG height")
+        self.rows_left -= len(rows)
+        scanlines = np.zeros((len(rows), width * channels + 1), dtype=np.uint8)
+        scanlines[:, 1:] = rows
+        data = self._z.compress(scanlines)
+        if data:
+            self._f.write(_chunk(b"IDAT", data))
+
+    def close(self):
+        if self._f.closed:
+            return
+        if self.rows_left:
+            self._f.close()
+            raise ValueError(f"PNG closed with {self.rows_left} row(s) missing")
+        self._f.write(_chunk(b"IDAT", self._z.flush()))
+        self._f.write(_chunk(b"IEND", b""))
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+
+
+class _RawWriter:
+    """Rows appended as raw bytes after a header written by the subclass."""
+    kind = "raw"
+
+    def __init__(self, path: str, height: int, width: int, channels: int):
+        self.shape = (width, channels)
+        self.rows_left = height
+        self._f = open(path, "wb")
+
+    def write_rows(self, rows: np.ndarray):
+        width, channels = self.shape
+        rows = np.ascontiguousarray(rows, dtype=np.uint8).reshape(-1, width * channels)
+        if len(rows) > self.rows_left:
+            raise ValueError(f"More rows written than the {self.kind} height")
+        self.rows_left -= len(rows)
+        self._f.write(memoryview(rows).cast("B"))
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.close()
+        if self.rows_left:
+            raise ValueError(f"{self.kind} closed with {self.rows_left} row(s) missing")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+
+
+class TIFFWriter(_RawWriter):
+    """Uncompressed baseline TIFF in a single strip, written row by row."""
+    kind = "TIFF"
+
+    def __init__(self, path: str, height: int, width: int, channels: int = 3):
+        super().__init__(path, height, width, channels)
+        # (tag, type, count, value); type 3 = SHORT, 4 = LONG
+        tags = [(256, 4, 1, width), (257, 4, 1, height), (258, 3, channels, 8), (259, 3, 1, 1),
+                (262, 3, 1, 2 if channels >= 3 else 1), (273, 4, 1, 0), (277, 3, 1, channels),
+                (278, 4, 1, height), (279, 4, 1, height * width * channels), (284, 3, 1, 1)]
+        if channels in (2, 4):
+            tags.append((338, 3, 1, 2))   # ExtraSamples: unassociated alpha
+        # Header, IFD, out-of-line BitsPerSample values, then the pixels
+        bits_offset = 8 + 2 + 12 * len(tags) + 4
+        data_offset = bits_offset + (2 * channels if channels > 2 else 0)
+        out = [b"II*\x00", struct.pack("<IH", 8, len(tags))]
+        for tag, kind, count, value in tags:
+            if tag == 258:
+                packed = struct.pack("<I", bits_offset) if channels > 2 else struct.pack("<2H", 8, 8 * (channels - 1))
+            elif tag == 273:
+                packed = struct.pack("<I", data_offset)
+            else:
+                packed = struct.pack("<I", value) if kind == 4 else struct.pack("<2H", value, 0)
+            out.append(struct.pack("<HHI", tag, kind, count) + packed)
+        out.append(struct.pack("<I", 0))
+        if channels > 2:
+            out.append(struct.pack(f"<{channels}H", *([8] * channels)))
+        self._f.write(b"".join(out))
+
+
+class NPYWriter(_RawWriter):
+    """Raw uint8 .npy of shape (height, width[, channels]), written row by row."""
+    kind = "NPY"
+
+    def __init__(self, path: str, height: int, width: int, channels: int = 3):
+        super().__init__(path, height, width, channels)
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        np.lib.format.write_array_header_1_0(self._f, {"descr": "|u1", "fortran_order": False, "shape": shape})
+
+
+# ---------- Memory-mapped input ----------
+_NATIVE_MODES = {"L": 1, "LA": 2, "RGB": 3, "RGBA": 4}
+_SWAPPED = {"RGB": "BGR"}      # raw modes stored with reversed channels (BMP)
+
+
+def _raw_tile(path: str, tile, mode: str) -> np.ndarray | None:
+    """(rows, width[, channels]) view of one uncompressed PIL tile, or None."""
+    codec, (x0, y0, x1, y1), offset, args = tile
+    args = (args,) if isinstance(args, str) else tuple(args)
+    rawmode, stride, ystep = args + (0, 1)[len(args) - 1:]
+    if codec != "raw" or rawmode not in (mode, _SWAPPED.get(mode)) or ystep not in (1, -1):
+        return None
+    channels = _NATIVE_MODES[mode]
+    rows, row_bytes = y1 - y0, (x1 - x0) * channels
+    stride = stride or row_bytes
+    size = (rows - 1) * stride + row_bytes     # the last row may lack its stride padding
+    if rows <= 0 or offset + size > os.path.getsize(path):
+        return None
+    flat = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(size,))
+    view = np.lib.stride_tricks.as_strided(flat, (rows, x1 - x0, channels), (stride, channels, 1), writeable=False)
+    if ystep == -1:
+        view = view[::-1]
+    if rawmode != mode:
+        view = view[..., ::-1]
+    return view[..., 0] if channels == 1 else view
+
+
+def _read_layout(path: str) -> tuple:
+    """Mode, size and tile list of an image file, without decoding any pixels.
+
+    Only the header is parsed and raw tiles are mapped rather than
+    decompressed, so the format plugins are called directly, as
+    Image.open does but without its decompression-bomb check. The
+    process-wide Image.MAX_IMAGE_PIXELS guard stays in place.
+    """
+    from PIL import Image
+    with open(path, "rb") as f:
+        prefix = f.read(16)
+        for loader in (Image.preinit, Image.init):
+            loader()
+            for fmt in list(Image.ID):
+                factory, accept = Image.OPEN[fmt]
+                if accept is not None and accept(prefix) is not True:
+                    continue
+                f.seek(0)
+                try:
+                    img = factory(f, path)
+                except (SyntaxError, IndexError, TypeError, struct.error):
+                    continue
+                return img.mode, img.size, list(img.tile)
+    raise OSError(f"Cannot identify image file {path!r}")
+
+
+class RawTiles:
+    """Row bands of an image stored as several uncompressed strips or tiles.
+
+    Slicing rows (arr[a:b]) assembles just that band from the memory-mapped
+    tiles, so reading an image band by band keeps one band in memory.
+    """
+    dtype = np.dtype(np.uint8)
+
+    def __init__(self, shape: tuple, tiles: list):
+        self.shape = shape
+        self.ndim = len(shape)
+        self.size = self.nbytes = int(np.prod(shape))
+        self._tiles = tiles            # [((x0, y0, x1, y1), view)]
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, rows) -> np.ndarray:
+        if not isinstance(rows, slice) or rows.step not in (None, 1):
+            raise TypeError("RawTiles supports contiguous row slices only")
+        start, stop, _ = rows.indices(self.shape[0])
+        band = np.empty((max(stop - start, 0),) + self.shape[1:], dtype=np.uint8)
+        for (x0, y0, x1, y1), view in self._tiles:
+            a, b = max(y0, start), min(y1, stop)
+            if a < b:
+                band[a - start:b - start, x0:x1] = view[a - y0:b - y0]
+        return band
+
+
+def map_pixels(path: str) -> np.ndarray | RawTiles | None:
+    """Pixels of a file without decoding them into memory, or None if it is compressed.
+
+    .npy files and uncompressed L/LA/RGB/RGBA images (raw TIFF, BMP, PPM,
+    ...) are memory-mapped: one tile covering the image comes back as a
+    read-only array view, several tiles as a RawTiles band reader.
+    """
+    if path.lower().endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    mode, (width, height), tiles = _read_layout(path)
+    if mode not in _NATIVE_MODES or not tiles:
+        return None
+    views = [_raw_tile(path, tile, mode) for tile in tiles]
+    if any(v is None for v in views):
+        return None
+    shape = (height, width) if mode == "L" else (height, width, _NATIVE_MODES[mode])
+    if len(views) == 1 and tuple(tiles[0][1]) == (0, 0, width, height):
+        return views[0]
+    return RawTiles(shape, [(tuple(t[1]), v) for t, v in zip(tiles, views)])
+
+
+def format_for(path: str) -> str:
+    """Default format name for an output path's extension."""
+    ext = os.path.splitext(path)[1].lower()
+    return {".tif": "tiff", ".tiff": "tiff", ".npy": "npy"}.get(ext, "png")
+
+
+def open_writer(path: str, height: int, width: int, channels: int = 3, fmt: str | None = None):
+    """Strip writer for path in format fmt (default: from the extension)."""
+    fmt = fmt or format_for(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown image format {fmt!r}; choose from {', '.join(FORMATS)}")
+    if fmt.startswith("png"):
+        return PNGWriter(path, height, width, channels, **FORMATS[fmt][1])
+    return (TIFFWriter if fmt == "tiff" else NPYWriter)(path, height, width, channels)
+
+
+def benchmark(shape=(2048, 2048, 3), directory: str = ".", seed: int = 0):
+    """Print write time and file size per format for a noise image (like a ciphertext)."""
+    from PIL import Image
+    noise = np.random.default_rng(seed).integers(0, 256, size=shape, dtype=np.uint8)
+    channels = shape[2] if len(shape) == 3 else 1
+    print(f"{'format':>8} {'MB':>8} {'ms':>9} {'MB/s':>8}")
+    results = []
+    for fmt, (ext, _) in FORMATS.items():
+        path = os.path.join(directory, f"_bench_{fmt}{ext}")
+        start = perf_counter()
+        with open_writer(path, shape[0], shape[1], channels, fmt) as w:
+            w.write_rows(noise)
+        seconds = perf_counter() - start
+        size = os.path.getsize(path)
+        loaded = np.load(path) if fmt == "npy" else np.asarray(Image.open(path))
+        assert (loaded == noise).all()
+        os.remove(path)
+        results.append({"format": fmt, "bytes": size, "seconds": seconds})
+        print(f"{fmt:>8} {size / 1e6:>8.2f} {seconds * 1e3:>9.1f} {noise.nbytes / 1e6 / seconds:>8.0f}")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
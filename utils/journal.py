@@ -0,0 +1,62 @@
+"""Checkpoint journals for resumable chunked jobs.
+
+A job processes its input in numbered chunks, in order, into a
+preallocated output file. After each chunk the journal records a digest of
+the chunk's output bytes (plus any state the job needs to continue, such
+as an RNG state) and is atomically replaced, so a crash loses at most the
+chunk in flight. On restart the leading chunks whose output still matches
+their digest are skipped.
+"""
+import os
+import json
+import hashlib
+
+
+def chunk_digest(buffer) -> str:
+    return hashlib.blake2b(memoryview(buffer).cast("B"), digest_size=8).hexdigest()
+
+
+class ChunkJournal:
+    """Completed chunks of one job, stored as JSON next to its output."""
+
+    def __init__(self, path: str, params: dict):
+        self.path = path
+        self.params = json.loads(json.dumps(params))
+        self.digests = []
+        self.state = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved["params"] != self.params:
+                raise ValueError(f"Journal {path} belongs to a different job; delete it to start over")
+            self.digests = saved["digests"]
+            self.state = saved.get("state")
+
+    def resume(self, digest_of) -> int:
+        """Number of leading chunks whose output still matches; later records are dropped.
+
+        The saved state is kept only if every recorded chunk verified.
+        """
+        for k, expected in enumerate(self.digests):
+            if digest_of(k) != expected:
+                del self.digests[k:]
+                self.state = None
+                break
+        return len(self.digests)
+
+    def commit(self, k: int, digest: str, state=None):
+        if k != len(self.digests):
+            raise ValueError(f"Chunk {k} committed out of order")
+        self.digests.append(digest)
+        self.state = state
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"params": self.params, "digests": self.digests, "state": state}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def finish(self):
+        """Remove the journal once the whole output is written."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,202 @@
+"""Fused Hill kernels, compiled with Numba when it is installed.
+
+The NumPy paths make a pass over memory per step: upcast, pad, matmul
+and modulo, and for audio also gather, mask and downcast. The kernels
+here run the whole per-block pipeline in one pass. Each block is read,
+multiplied, masked and reduced in registers, then written straight to
+the output, with no intermediate arrays.
+
+The backend is "auto" (Numba if installed, else NumPy), "numpy" or
+"numba"; set it with set_backend() or the HILL_BACKEND environment
+variable. Without Numba the kernels are plain Python loops, so the
+NumPy paths are used instead.
+
+    python -m utils.kernels [numpy|numba ...]   # time and cross-check the backends
+"""
+import os
+import sys
+from time import perf_counter
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+BACKENDS = ("auto", "numpy", "numba")
+_requested = os.environ.get("HILL_BACKEND", "auto")
+
+
+def _compile(fn):
+    # nogil: the kernels run in pipeline threads next to I/O
+    return njit(cache=True, nogil=True)(fn) if NUMBA_AVAILABLE else fn
+
+
+# ---------- Backend selection ----------
+def set_backend(name: str):
+    """Select the kernel backend for later calls: "auto", "numpy" or "numba"."""
+    global _requested
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}; choose from {', '.join(BACKENDS)}")
+    if name == "numba" and not NUMBA_AVAILABLE:
+        raise ValueError("The numba backend needs Numba installed (pip install numba)")
+    _requested = name
+
+
+def backend() -> str:
+    """Backend in use: "numba" or "numpy" (an unavailable choice falls back to NumPy)."""
+    return "numba" if _requested in ("auto", "numba") and NUMBA_AVAILABLE else "numpy"
+
+
+def fused() -> bool:
+    return backend() == "numba"
+
+
+def available_backends() -> list:
+    return ["numpy", "numba"] if NUMBA_AVAILABLE else ["numpy"]
+
+
+# ---------- Kernels ----------
+@_compile
+def _hill_rows(src, key, modulus, out):
+    n = key.shape[0]
+    size = src.size
+    x = np.zeros(n, dtype=np.int64)
+    for base in range(0, size, n):
+        # Read the block first: out may alias src
+        for j in range(n):
+            x[j] = src[base + j] if base + j < size else 0
+        for i in range(min(n, size - base)):
+            acc = 0
+            for j in range(n):
+                acc += key[i, j] * x[j]
+            out[base + i] = acc % modulus
+
+
+@_compile
+def _audio_encrypt(frames, idx, key, masks, word_mask, out):
+    n = key.shape[0]
+    num_frames, channels = frames.shape
+    x = np.zeros(n, dtype=np.uint64)
+    for r in range(idx.size):
+        base = idx[r] * n
+        for c in range(channels):
+            for i in range(n):
+                x[i] = np.uint64(frames[base + i, c]) if base + i < num_frames else np.uint64(0)
+            for j in range(n):
+                # uint64 arithmetic wraps mod 2^64, a multiple of the word modulus
+                acc = np.uint64(masks[r, c * n + j])
+                for i in range(n):
+                    acc += x[i] * key[i, j]
+                out[r * n + j, c] = acc & word_mask
+
+
+@_compile
+def _audio_decrypt(frames, positions, key, masks, word_mask, out):
+    n = key.shape[0]
+    num_frames, channels = frames.shape
+    x = np.zeros(n, dtype=np.uint64)
+    for r in range(positions.size):
+        base = positions[r] * n
+        for c in range(channels):
+            for i in range(n):
+                sample = np.uint64(frames[base + i, c]) if base + i < num_frames else np.uint64(0)
+                x[i] = (sample - np.uint64(masks[r, c * n + i])) & word_mask
+            for j in range(n):
+                acc = np.uint64(0)
+                for i in range(n):
+                    acc += x[i] * key[i, j]
+                out[r, c, j] = acc & word_mask
+
+
+# ---------- Entry points ----------
+def hill_rows(src: np.ndarray, key: np.ndarray, modulus: int, out: np.ndarray | None = None) -> np.ndarray:
+    """(X @ K.T) mod m over the row-major n-blocks of src, zero-padding the last one, as uint8.
+
+    out may be src itself. Requires n * (m - 1)^2 < 2^63 so the int64 sums cannot overflow.
+    """
+    flat = np.ascontiguousarray(src).reshape(-1)
+    out = np.empty(flat.size, dtype=np.uint8) if out is None else out
+    _hill_rows(flat, np.asarray(key, dtype=np.int64) % modulus, modulus, out.reshape(-1))
+    return out
+
+
+def audio_encrypt(frames: np.ndarray, idx: np.ndarray, key: np.ndarray, masks: np.ndarray,
+                  modulus: int) -> np.ndarray:
+    """Frames (len(idx) * n, channels) of source blocks idx, each (block @ K + mask) mod modulus.
+
+    frames is the (frames, channels) unsigned-word view of the input and
+    masks the (len(idx), channels * n) keystream draw; the result has the
+    word dtype, so it is also the mod-modulus wrap.
+    """
+    n = key.shape[0]
+    out = np.empty((len(idx) * n, frames.shape[1]), dtype=frames.dtype)
+    _audio_encrypt(frames, np.asarray(idx, dtype=np.int64), (key % modulus).astype(np.uint64),
+                   masks, np.uint64(modulus - 1), out)
+    return out
+
+
+def audio_decrypt(frames: np.ndarray, positions: np.ndarray, key: np.ndarray, masks: np.ndarray,
+                  modulus: int) -> np.ndarray:
+    """Blocks (len(positions), channels, n) of ((block - mask) @ K) mod modulus, in the word dtype."""
+    n = key.shape[0]
+    out = np.empty((len(positions), frames.shape[1], n), dtype=frames.dtype)
+    _audio_decrypt(frames, np.asarray(positions, dtype=np.int64), (key % modulus).astype(np.uint64),
+                   masks, np.uint64(modulus - 1), out)
+    return out
+
+
+# ---------- Benchmark ----------
+def benchmark(backends=None, image_shape=(2048, 2048, 3), audio_frames=4_000_000, seed: int = 0):
+    """Time image encoding and audio encryption/decryption on each backend and check that outputs agree.
+
+    Each case runs once untimed first, so Numba's compilation is not counted.
+    """
+    global _requested
+    import tempfile
+    from scipy.io import wavfile
+    from hill.image_cipher import Hill
+    from hill.audio_cipher import _decrypt_file, _encrypt_file
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=image_shape, dtype=np.uint8)
+    samples = rng.integers(-32768, 32768, size=(audio_frames, 2), dtype=np.int16)
+    hills = {n: Hill(key) for n, key in ((2, [[3, 3], [2, 5]]), (3, [[2, 3, 1], [1, 1, 1], [1, 2, 3]]))}
+
+    def transform_wav(transform, path, suffix):
+        # Written next to the input, in the temporary directory
+        out_path = transform(path, np.array([[3, 3], [2, 5]]), 1234, None, keystream="seekable",
+                             out_path=os.path.splitext(path)[0] + suffix)
+        return wavfile.read(out_path)[1]
+
+    cases = [(f"image n={n}", pixels.nbytes, lambda h=h: h.encode(pixels)) for n, h in hills.items()]
+    # Decryption reads the file encryption wrote just before it
+    cases.append(("audio enc n=2", samples.nbytes, lambda: transform_wav(_encrypt_file, wav, "-encrypted.wav")))
+    cases.append(("audio dec n=2", samples.nbytes,
+                  lambda: transform_wav(_decrypt_file, wav[:-4] + "-encrypted.wav", "-decrypted.wav")))
+    previous, results, reference = _requested, [], {}
+    with tempfile.TemporaryDirectory() as directory:
+        wav = os.path.join(directory, "bench.wav")
+        wavfile.write(wav, 48000, samples)
+        try:
+            for name in backends or available_backends():
+                set_backend(name)
+                for case, size, run in cases:
+                    run()
+                    start = perf_counter()
+                    out = np.asarray(run())
+                    seconds = perf_counter() - start
+                    assert np.array_equal(out, reference.setdefault(case, out)), f"{name} disagrees on {case}"
+                    results.append({"backend": name, "case": case, "seconds": seconds})
+        finally:
+            _requested = previous
+    print(f"{'backend':>8} {'case':>13} {'ms':>9} {'MB/s':>8}")
+    sizes = {case: size for case, size, _ in cases}
+    for r in results:
+        print(f"{r['backend']:>8} {r['case']:>13} {r['seconds'] * 1e3:>9.1f} "
+              f"{sizes[r['case']] / 1e6 / r['seconds']:>8.0f}")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1:] or None)
@@ -0,0 +1,192 @@
+"""Block permutation and sample mask streams of the audio cipher.
+
+"legacy" is the original construction: np.random.seed(seed) permutation
+and a seed + 1 mask stream from MT19937. It can only be drawn in order,
+so reaching block i means generating everything before it.
+
+"seekable" derives both from a counter: the permutation is a keyed
+Feistel network over the block index (cycle-walked into range) and the
+mask of sample s is a keyed mix of s, so any block's position and mask
+are computed in O(1). Files encrypted in one mode must be decrypted in
+the same mode.
+"""
+import base64
+import numpy as np
+
+MODES = ("legacy", "seekable")
+
+_M1 = np.uint64(0xBF58476D1CE4E5B9)
+_M2 = np.uint64(0x94D049BB133111EB)
+_FEISTEL_ROUNDS = 6
+
+
+def _mix(z: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer on uint64 arrays (wrapping arithmetic)."""
+    z = z ^ (z >> np.uint64(30))
+    z = z * _M1
+    z = z ^ (z >> np.uint64(27))
+    z = z * _M2
+    return z ^ (z >> np.uint64(31))
+
+
+def _mix_into(z: np.ndarray, tmp: np.ndarray) -> np.ndarray:
+    """_mix(z) computed in place, with tmp (same shape, uint64) as scratch."""
+    for shift, mult in ((30, _M1), (27, _M2), (31, None)):
+        np.right_shift(z, np.uint64(shift), out=tmp)
+        np.bitwise_xor(z, tmp, out=z)
+        if mult is not None:
+            np.multiply(z, mult, out=z)
+    return z
+
+
+class LegacyKeystream:
+    """MT19937 streams of the original cipher; masks are drawn in order."""
+    mode = "legacy"
+
+    def __init__(self, seed: int, num_blocks: int, n: int, modulus: int = 65536):
+        self.n = n
+        self.num_blocks = num_blocks
+        self.modulus = modulus
+        self._perm = self._inverse = None
+        self._seed = seed
+        self._rng = np.random.RandomState(seed + 1)
+        self.cursor = 0
+
+    def perm(self, idx) -> np.ndarray:
+        """Source block of each output position idx."""
+        if self._perm is None:
+            self._perm = np.random.RandomState(self._seed).permutation(self.num_blocks)
+        return self._perm[idx]
+
+    def inverse(self, blocks) -> np.ndarray:
+        """Output position of each source block."""
+        if self._inverse is None:
+            perm = self.perm(slice(None))
+            self._inverse = np.empty_like(perm)
+            self._inverse[perm] = np.arange(len(perm))
+        return self._inverse[blocks]
+
+    def next_masks(self, count: int) -> np.ndarray:
+        self.cursor += count
+        return self._rng.randint(0, self.modulus, size=(count, self.n), dtype=np.int64)
+
+    def skip(self, count: int, chunk: int = 1 << 16):
+        for done in range(0, count, chunk):
+            self.next_masks(min(chunk, count - done))
+
+    def masks_at(self, positions: np.ndarray, chunk: int = 1 << 16) -> np.ndarray:
+        """Masks of arbitrary output positions: replays the stream up to the last one."""
+        positions = np.asarray(positions)
+        out = np.empty((len(positions), self.n), dtype=np.int64)
+        order = np.argsort(positions, kind="stable")
+        ordered = positions[order]
+        rng = np.random.RandomState(self._seed + 1)
+        end = int(ordered[-1]) + 1 if len(ordered) else 0
+        lo = 0
+        for a in range(0, end, chunk):
+            masks = rng.randint(0, self.modulus, size=(min(chunk, end - a), self.n), dtype=np.int64)
+            hi = np.searchsorted(ordered, a + len(masks))
+            out[order[lo:hi]] = masks[ordered[lo:hi] - a]
+            lo = hi
+        return out
+
+    def state(self) -> dict:
+        _, keys, pos, _, _ = self._rng.get_state()
+        return {"keys": base64.b64encode(keys.astype("<u4").tobytes()).decode("ascii"), "pos": int(pos),
+                "cursor": self.cursor}
+
+    def restore(self, state: dict):
+        keys = np.frombuffer(base64.b64decode(state["keys"]), dtype="<u4")
+        self._rng.set_state(("MT19937", keys, state["pos"], 0, 0.0))
+        self.cursor = state["cursor"]
+
+
+class SeekableKeystream:
+    """Counter-based permutation and mask; every block is computed independently."""
+    mode = "seekable"
+
+    def __init__(self, seed: int, num_blocks: int, n: int, modulus: int = 65536):
+        if modulus & (modulus - 1) or not 1 < modulus <= 1 << 32:
+            raise ValueError(f"Seekable masks need a power-of-two modulus up to 2^32, got {modulus}")
+        self.n = n
+        self.num_blocks = num_blocks
+        self.modulus = modulus
+        self._shift = np.uint64(65 - modulus.bit_length())   # keep the top log2(modulus) bits
+        words = np.random.SeedSequence(seed).generate_state(_FEISTEL_ROUNDS + 1, dtype=np.uint64)
+        self._round_keys, self._mask_key = words[:-1], words[-1]
+        self._half = max(1, (max(num_blocks - 1, 1).bit_length() + 1) // 2)
+        self._low = np.uint64((1 << self._half) - 1)
+        self._ramp = np.empty(0, dtype=np.uint64)
+        self.cursor = 0
+
+    def _forward(self, x: np.ndarray) -> np.ndarray:
+        h = np.uint64(self._half)
+        left, right = x >> h, x & self._low
+        for k in self._round_keys:
+            left, right = right, left ^ (_mix(right ^ k) & self._low)
+        return (left << h) | right
+
+    def _backward(self, y: np.ndarray) -> np.ndarray:
+        h = np.uint64(self._half)
+        left, right = y >> h, y & self._low
+        for k in self._round_keys[::-1]:
+            left, right = right ^ (_mix(left ^ k) & self._low), left
+        return (left << h) | right
+
+    def _walk(self, x, rounds) -> np.ndarray:
+        # The network permutes [0, 4^half); cycle-walk until the value lands in [0, num_blocks)
+        y = rounds(np.asarray(x, dtype=np.uint64).reshape(-1))
+        bad = np.flatnonzero(y >= self.num_blocks)
+        while bad.size:
+            y[bad] = rounds(y[bad])
+            bad = bad[y[bad] >= self.num_blocks]
+        return y.astype(np.int64).reshape(np.shape(x))
+
+    def perm(self, idx) -> np.ndarray:
+        """Source block of each output position idx."""
+        return self._walk(idx, self._forward)
+
+    def inverse(self, blocks) -> np.ndarray:
+        """Output position of each source block."""
+        return self._walk(blocks, self._backward)
+
+    def masks_at(self, positions) -> np.ndarray:
+        samples = np.asarray(positions, dtype=np.uint64).reshape(-1, 1) * np.uint64(self.n) \
+            + np.arange(self.n, dtype=np.uint64)
+        return (_mix(samples ^ self._mask_key) >> self._shift).astype(np.int64)
+
+    def sample_masks_into(self, first_sample: int, out: np.ndarray, tmp: np.ndarray) -> np.ndarray:
+        """Masks of samples first_sample, first_sample + 1, ... written into uint64 out.
+
+        Equal to masks_at() on whole blocks; tmp is uint64 scratch of the same
+        size, so repeated calls allocate nothing.
+        """
+        if self._ramp.size < out.size:
+            self._ramp = np.arange(out.size, dtype=np.uint64)
+        np.add(self._ramp[:out.size], np.uint64(first_sample), out=out)
+        np.bitwise_xor(out, self._mask_key, out=out)
+        _mix_into(out, tmp)
+        return np.right_shift(out, self._shift, out=out)
+
+    def next_masks(self, count: int) -> np.ndarray:
+        masks = self.masks_at(np.arange(self.cursor, self.cursor + count))
+        self.cursor += count
+        return masks
+
+    def skip(self, count: int):
+        self.cursor += count
+
+    def state(self) -> dict:
+        return {"cursor": self.cursor}
+
+    def restore(self, state: dict):
+        self.cursor = state["cursor"]
+
+
+def make_keystream(mode: str, seed: int, num_blocks: int, n: int, modulus: int = 65536):
+    """Keystream of num_blocks blocks of n mask values in [0, modulus)."""
+    if mode == "legacy":
+        return LegacyKeystream(seed, num_blocks, n, modulus)
+    if mode == "seekable":
+        return SeekableKeystream(seed, num_blocks, n, modulus)
+    raise ValueError(f"Unknown keystream {mode!r}; choose from {', '.join(MODES)}")
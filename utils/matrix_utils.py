@@ -1,4 +1,5 @@
 import numpy as np
+from functools import lru_cache
 
 def mod_inverse(a, m):
     """Find modular inverse of a under mod m."""
@@ -16,3 +17,199 @@ def matrix_mod_inv(matrix, modulus):
     # Adjugate matrix
     matrix_adj = np.round(det * np.linalg.inv(matrix)).astype(int) % modulus
     return (det_inv * matrix_adj) % modulus
+
+
+def _prime_power_factors(modulus):
+    """Split modulus into [(p, p**e), ...]."""
+    factors = []
+    m, p = modulus, 2
+    while p * p <= m:
+        if m % p == 0:
+            q = 1
+            while m % p == 0:
+                m //= p
+                q *= p
+            factors.append((p, q))
+        p += 1
+    if m > 1:
+        factors.append((m, m))
+    return factors
+
+
+@lru_cache(maxsize=None)
+def _unit_inverses(p, q):
+    """Table of x^-1 mod q for units x (0 elsewhere)."""
+    table = np.zeros(q, dtype=np.int64)
+    for x in range(1, q):
+        if x % p:
+            table[x] = pow(x, -1, q)
+    table.flags.writeable = False
+    return table
+
+
+# Above this modulus, inverse tables get too large and int64 products overflow
+_WIDE_MODULUS = 1 << 31
+
+
+def _batch_inv_prime_power(A, p, q):
+    """Gauss-Jordan over Z_q (q = p**e) for a stack of matrices of shape (B, n, n)."""
+    B, n, _ = A.shape
+    rows = np.arange(B)
+    if q > _WIDE_MODULUS:
+        # Python integers: exact products, inverses computed per pivot
+        unit_inv = np.frompyfunc(lambda x: pow(x, -1, q) if x % p else 0, 1, 1)
+        A = A.astype(object)
+    else:
+        unit_inv = _unit_inverses(p, q).__getitem__
+
+    aug = np.concatenate([A % q, np.broadcast_to(np.eye(n, dtype=A.dtype), A.shape)], axis=2)
+    ok = np.ones(B, dtype=bool)
+    for k in range(n):
+        unit = aug[:, k:, k] % p != 0
+        ok &= unit.any(axis=1)
+        piv = k + unit.argmax(axis=1)
+
+        pivot_row = aug[rows, piv].copy()
+        aug[rows, piv] = aug[:, k]
+        aug[:, k] = (pivot_row * unit_inv(pivot_row[:, k])[:, None]) % q
+
+        factors = aug[:, :, k].copy()
+        factors[:, k] = 0
+        aug -= factors[:, :, None] * aug[:, k][:, None, :]
+        aug %= q
+    return aug[:, :, n:].astype(np.int64), ok
+
+
+def batch_mod_inv(matrices, modulus):
+    """Exact modular inverses of a stack of square matrices.
+
+    Works for any modulus by solving over each prime-power factor and
+    recombining with the CRT. Returns (inverses, ok) where ok flags the
+    matrices that are invertible mod m; entries of non-invertible ones are
+    meaningless.
+    """
+    A = np.asarray(matrices, dtype=np.int64) % modulus
+    single = A.ndim == 2
+    if single:
+        A = A[np.newaxis]
+
+    inv = np.zeros_like(A, dtype=object if modulus > _WIDE_MODULUS else np.int64)
+    ok = np.ones(A.shape[0], dtype=bool)
+    for p, q in _prime_power_factors(modulus):
+        inv_q, ok_q = _batch_inv_prime_power(A % q, p, q)
+        ok &= ok_q
+        rest = modulus // q
+        coef = rest * pow(rest, -1, q) % modulus if rest > 1 else 1
+        inv = (inv + inv_q.astype(inv.dtype) * coef) % modulus
+    inv = inv.astype(np.int64)
+
+    if single:
+        return inv[0], bool(ok[0])
+    return inv, ok
+
+
+def matrix_mod_inv_exact(matrix, modulus):
+    """Exact modular inverse of a square matrix (no floating-point determinant)."""
+    inv, ok = batch_mod_inv(matrix, modulus)
+    if not ok:
+        raise ValueError(f"Matrix not invertible mod {modulus}")
+    return inv
+
+
+# ---------- Exact modular matmul ----------
+# Inner dimension from which float64 BLAS beats NumPy's integer matmul
+BLAS_MIN_SIZE = 8
+_FLOAT_EXACT = 1 << 53
+_INT64_LIMIT = 1 << 63
+
+
+def _limb_bits(k, modulus):
+    """Widest limb such that k products of two limbs sum exactly in float64."""
+    for bits in range(max((modulus - 1).bit_length(), 1), 0, -1):
+        if k * ((1 << bits) - 1) ** 2 < _FLOAT_EXACT:
+            return bits
+    raise ValueError(f"Inner dimension {k} too large for exact float64 products")
+
+
+def _split_limbs(X, bits, limbs):
+    mask = (1 << bits) - 1
+    return [((X >> (bits * i)) & mask).astype(np.float64) for i in range(limbs)]
+
+
+def mod_matmul(A, B, modulus, method="auto"):
+    """Exact (A @ B) mod m, as int64, for any modulus below 2^63.
+
+    method="blas" splits the operands into limbs small enough that every
+    float64 partial product is exact, runs them through BLAS and recombines
+    the results mod m. method="int" is the plain int64 matmul. "auto" picks
+    BLAS once the inner dimension reaches BLAS_MIN_SIZE, or whenever the
+    int64 sums could overflow. Moduli whose squares do not fit in int64
+    are recombined (or, for "int", multiplied) with Python integers.
+    """
+    A = np.asarray(A)
+    B = np.asarray(B)
+    k = A.shape[-1]
+    if not 0 < modulus < _INT64_LIMIT:
+        raise ValueError(f"Modulus must be in [1, 2^63), got {modulus}")
+    if method == "auto":
+        overflow = k * (modulus - 1) ** 2 >= _INT64_LIMIT
+        method = "blas" if k >= BLAS_MIN_SIZE or overflow else "int"
+    if method == "int":
+        if k * (modulus - 1) ** 2 >= _INT64_LIMIT:
+            A_wide = (A.astype(np.int64) % modulus).astype(object)
+            B_wide = (B.astype(np.int64) % modulus).astype(object)
+            return (A_wide @ B_wide % modulus).astype(np.int64)
+        return (A.astype(np.int64) @ B.astype(np.int64)) % modulus
+    if method != "blas":
+        raise ValueError(f"Unknown matmul method {method!r}")
+
+    bits = _limb_bits(k, modulus)
+    limbs = -(-max((modulus - 1).bit_length(), 1) // bits)
+    A_limbs = _split_limbs(A.astype(np.int64) % modulus, bits, limbs)
+    B_limbs = _split_limbs(B.astype(np.int64) % modulus, bits, limbs)
+    if limbs == 1:
+        return (A_limbs[0] @ B_limbs[0]).astype(np.int64) % modulus
+
+    # part * weight and out + part stay below 2^63 only while m^2 does
+    wide = modulus ** 2 >= _INT64_LIMIT
+    out = None
+    for i in range(limbs):
+        for j in range(limbs):
+            weight = pow(2, bits * (i + j), modulus)
+            if weight == 0:
+                continue
+            part = (A_limbs[i] @ B_limbs[j]).astype(np.int64) % modulus
+            part = (part.astype(object) if wide else part) * weight % modulus
+            out = part if out is None else (out + part) % modulus
+    return out.astype(np.int64)
+
+
+# ---------- Cross-check ----------
+CHECK_MODULI = (95, 256, 65536, (1 << 31) - 1, 1 << 32, (1 << 40) + 15, (1 << 61) - 1, (1 << 63) - 25)
+CHECK_SIZES = (2, 3, 8, 16, 64)
+
+
+def check_matmul(trials: int = 5, moduli=CHECK_MODULI, sizes=CHECK_SIZES, seed: int = 0) -> int:
+    """Compare both mod_matmul paths with Python-integer products on random operands.
+
+    Prints one line per modulus and returns the number of mismatching trials.
+    """
+    rng = np.random.default_rng(seed)
+    failures = 0
+    for modulus in moduli:
+        bad = 0
+        for k in sizes:
+            for _ in range(trials):
+                A = rng.integers(0, modulus, size=(32, k), dtype=np.uint64).astype(object)
+                B = rng.integers(0, modulus, size=(k, k), dtype=np.uint64).astype(object)
+                expected = (A @ B) % modulus
+                for method in ("int", "blas"):
+                    result = mod_matmul(A.astype(np.int64), B.astype(np.int64), modulus, method)
+                    bad += not np.array_equal(result.astype(object), expected)
+        failures += bad
+        print(f"mod {modulus:>20}: {'ok' if not bad else f'{bad} mismatch(es)'}")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if check_matmul() else 0)
@@ -0,0 +1,235 @@
+"""Process-wide cipher metrics with Prometheus text export.
+
+Metric families hand out pre-bound children via .labels(...), so hot paths
+bind once at import time and only pay for an increment per call:
+
+    ops = OPS.labels("image", "encode")
+    ops.inc()
+
+REGISTRY.render() returns the Prometheus text format; write_textfile()
+dumps it for node_exporter's textfile collector and serve() exposes it on a
+local HTTP endpoint.
+"""
+import os
+import threading
+import functools
+from bisect import bisect_left
+from time import perf_counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra="") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ---------- Metric families ----------
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def labels(self, *values):
+        """Pre-bound child for these label values (created once, then reused)."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+# Latency buckets in seconds, from sub-millisecond text blocks to large files
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            labels = _format_labels(self.labelnames, values, 'le="' + le + '"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {repr(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# ---------- Registry ----------
+class Registry:
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def register(self, family: _Family):
+        with self._lock:
+            if family.name in self._families:
+                raise ValueError(f"Metric {family.name} already registered")
+            self._families[family.name] = family
+
+    def get(self, name: str) -> _Family:
+        return self._families[name]
+
+    def render(self) -> str:
+        lines = []
+        for family in list(self._families.values()):
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Atomically write the current metrics to path."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port: int = 9464, addr: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Expose /metrics on a local endpoint from a daemon thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((addr, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+REGISTRY = Registry()
+
+
+# ---------- Cipher metrics ----------
+OPS = Counter("hill_operations_total", "Cipher operations completed", ("cipher", "op"))
+BYTES_IN = Counter("hill_bytes_in_total", "Bytes consumed by cipher operations", ("cipher", "op"))
+BYTES_OUT = Counter("hill_bytes_out_total", "Bytes produced by cipher operations", ("cipher", "op"))
+LATENCY = Histogram("hill_operation_seconds", "Cipher operation latency", ("cipher", "op"))
+ERRORS = Counter("hill_errors_total", "Cipher operations that raised", ("cipher", "op"))
+KEY_CACHE = Counter("hill_key_cache_total", "Key-derived table lookups", ("cipher", "result"))
+PIPELINE_SECONDS = Counter("hill_pipeline_seconds_total", "Seconds spent per pipeline stage",
+                           ("cipher", "op", "stage"))
+
+
+def record_pipeline(cipher: str, op: str, times):
+    """Add the stage times of a run_pipeline call to PIPELINE_SECONDS and return them."""
+    for stage, seconds in times._asdict().items():
+        PIPELINE_SECONDS.labels(cipher, op, stage).inc(seconds)
+    return times
+
+
+def instrument(cipher: str, op: str, size_in=None, size_out=None):
+    """Decorator recording count, bytes, latency and errors of a cipher call.
+
+    size_in is called with the call's arguments and size_out with its result;
+    both return a byte count. All children are bound when decorating.
+    """
+    ops = OPS.labels(cipher, op)
+    bytes_in = BYTES_IN.labels(cipher, op)
+    bytes_out = BYTES_OUT.labels(cipher, op)
+    latency = LATENCY.labels(cipher, op)
+    errors = ERRORS.labels(cipher, op)
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                latency.observe(perf_counter() - start)
+            ops.inc()
+            if size_in is not None:
+                bytes_in.inc(size_in(*args, **kwargs))
+            if size_out is not None:
+                bytes_out.inc(size_out(result))
+            return result
+        return wrapper
+    return decorate
@@ -0,0 +1,169 @@
+"""Content-addressed on-disk cache of cipher outputs.
+
+An entry is named by a digest of the input bytes, the key fingerprint, the
+modulus and the mode (operation plus anything else that changes the
+output, such as the audio seed), so re-submitting the same input with the
+same key returns the stored artifact instead of recomputing and
+re-encoding it. The cache is bounded in bytes; entries are bumped on every
+hit and the least recently used ones are evicted first.
+
+    python -m utils.output_cache            # show entries and size
+    python -m utils.output_cache --clear
+"""
+import os
+import shutil
+import hashlib
+import threading
+import numpy as np
+from utils.metrics import Counter
+from utils.planner import parse_size
+from utils.structured_keys import StructuredKey
+
+DEFAULT_DIR = os.environ.get("HILL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "hill"))
+DEFAULT_MAX_BYTES = "2GB"
+_READ_CHUNK = 1 << 20
+
+OUTPUT_CACHE = Counter("hill_output_cache_total", "Output cache lookups and evictions", ("cipher", "result"))
+
+
+# ---------- Digests ----------
+def key_fingerprint(key, modulus: int) -> bytes:
+    """Stable digest of a dense or structured key reduced mod m."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(modulus).encode())
+    if isinstance(key, StructuredKey):
+        for kind, f in key.factors:
+            h.update(kind.encode())
+            h.update(np.ascontiguousarray(f, dtype="<i8").tobytes())
+    else:
+        key = np.asarray(key, dtype=np.int64) % modulus
+        h.update(str(key.shape).encode())
+        h.update(np.ascontiguousarray(key, dtype="<i8").tobytes())
+    return h.digest()
+
+
+def content_digest(source) -> bytes:
+    """Digest of a file's bytes (source is a path) or of an array's shape and bytes."""
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            while chunk := f.read(_READ_CHUNK):
+                h.update(chunk)
+    else:
+        arr = np.ascontiguousarray(source)
+        h.update(f"{arr.dtype.str}{arr.shape}".encode())
+        h.update(memoryview(arr).cast("B"))
+    return h.digest()
+
+
+def cache_key(source, key, modulus: int, mode: str) -> str:
+    """Entry name for source encrypted/decrypted with key under modulus and mode."""
+    h = hashlib.blake2b(digest_size=20)
+    for part in (content_digest(source), key_fingerprint(key, modulus), mode.encode()):
+        h.update(len(part).to_bytes(4, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+# ---------- Cache ----------
+class OutputCache:
+    """Size-bounded LRU store of output files under root."""
+
+    def __init__(self, root: str = DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES, cipher: str = "any"):
+        self.root = root
+        self.max_bytes = parse_size(max_bytes)
+        self._hit = OUTPUT_CACHE.labels(cipher, "hit")
+        self._miss = OUTPUT_CACHE.labels(cipher, "miss")
+        self._evict = OUTPUT_CACHE.labels(cipher, "evict")
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name: str, ext: str) -> str:
+        return os.path.join(self.root, name[:2], name + ext)
+
+    def get(self, name: str, ext: str) -> str | None:
+        """Path of the cached entry, or None; a hit makes it most recently used."""
+        path = self._path(name, ext)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._miss.inc()
+            return None
+        self._hit.inc()
+        return path
+
+    def put(self, name: str, src_path: str, ext: str) -> str:
+        """Copy src_path into the cache (atomically) and evict down to the size bound."""
+        path = self._path(name, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(src_path, tmp)
+        os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def fetch(self, name: str, ext: str, out_path: str, produce) -> str:
+        """Copy a cached entry to out_path, or run produce() (which writes it) and store it."""
+        cached = self.get(name, ext)
+        if cached is not None:
+            if os.path.abspath(cached) != os.path.abspath(out_path):
+                shutil.copyfile(cached, out_path)
+            return out_path
+        result = produce()
+        self.put(name, out_path, ext)
+        return result
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        """(mtime, size, path) of every entry, least recently used first."""
+        found = []
+        for dirpath, _, files in os.walk(self.root):
+            for f in files:
+                if f.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, f)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((st.st_mtime, st.st_size, path))
+        return sorted(found)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        with self._lock:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self._evict.inc()
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+    def hit_rate(self) -> float:
+        hits, misses = self._hit.value, self._miss.value
+        return hits / (hits + misses) if hits + misses else 0.0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the cipher output cache")
+    parser.add_argument("--dir", default=DEFAULT_DIR)
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+    cache = OutputCache(args.dir)
+    if args.clear:
+        cache.clear()
+    entries = cache.entries()
+    print(f"{args.dir}: {len(entries)} entries, {sum(s for _, s, _ in entries) / 1e6:.1f} MB "
+          f"of {cache.max_bytes / 1e6:.0f} MB")
@@ -0,0 +1,139 @@
+"""Overlapped read -> compute -> write pipeline over chunks.
+
+The reader and compute stages run in their own threads and hand chunks to
+the next stage through bounded queues, so with depth=2 every stage works
+on one chunk while the next one is already buffered. NumPy kernels, file
+I/O and zlib release the GIL, so disk and CPU are busy at the same time
+and the wall-clock time approaches the slowest stage instead of the sum.
+An optional observe stage (e.g. a QualityAnalyzer) gets each result in
+order after it is written, in a thread of its own.
+"""
+import queue
+import threading
+from time import perf_counter
+from typing import NamedTuple
+
+PIPELINE_DEPTH = 2
+_DONE = object()
+
+
+class StageTimes(NamedTuple):
+    read: float      # seconds spent producing chunks
+    compute: float
+    write: float
+    wall: float
+    observe: float = 0.0
+
+    def __str__(self):
+        observed = f"observe {self.observe:.3f}s, " if self.observe else ""
+        return (f"read {self.read:.3f}s, compute {self.compute:.3f}s, write {self.write:.3f}s, "
+                f"{observed}wall {self.wall:.3f}s")
+
+
+class _Stop(Exception):
+    pass
+
+
+def _put(q: queue.Queue, item, stop: threading.Event):
+    while True:
+        if stop.is_set():
+            raise _Stop
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while True:
+        if stop.is_set():
+            raise _Stop
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+
+def run_pipeline(source, compute, write, depth: int = PIPELINE_DEPTH, observe=None) -> StageTimes:
+    """Feed every chunk of the iterable source through compute() into write().
+
+    Chunks reach write() in source order, then observe() if given; results
+    must not be modified after write() returns. An exception in any stage
+    stops the others and is re-raised in the calling thread, which runs write().
+    """
+    to_compute, to_write, to_observe = queue.Queue(depth), queue.Queue(depth), queue.Queue(depth)
+    stop = threading.Event()
+    errors = []
+    busy = {"read": 0.0, "compute": 0.0, "observe": 0.0}
+
+    def reader():
+        try:
+            it = iter(source)
+            while True:
+                start = perf_counter()
+                chunk = next(it, _DONE)
+                busy["read"] += perf_counter() - start
+                _put(to_compute, chunk, stop)
+                if chunk is _DONE:
+                    return
+        except _Stop:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def worker():
+        try:
+            while (chunk := _get(to_compute, stop)) is not _DONE:
+                start = perf_counter()
+                result = compute(chunk)
+                busy["compute"] += perf_counter() - start
+                _put(to_write, result, stop)
+            _put(to_write, _DONE, stop)
+        except _Stop:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def observer():
+        try:
+            while (result := _get(to_observe, stop)) is not _DONE:
+                start = perf_counter()
+                observe(result)
+                busy["observe"] += perf_counter() - start
+        except _Stop:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    t0 = perf_counter()
+    threads = [threading.Thread(target=reader, daemon=True), threading.Thread(target=worker, daemon=True)]
+    if observe is not None:
+        threads.append(threading.Thread(target=observer, daemon=True))
+    for t in threads:
+        t.start()
+    write_time = 0.0
+    try:
+        while (result := _get(to_write, stop)) is not _DONE:
+            start = perf_counter()
+            write(result)
+            write_time += perf_counter() - start
+            if observe is not None:
+                _put(to_observe, result, stop)
+        if observe is not None:
+            _put(to_observe, _DONE, stop)
+    except _Stop:
+        pass
+    except BaseException as e:
+        errors.append(e)
+    finally:
+        if errors:
+            stop.set()
+        for t in threads:
+            t.join()
+    if errors:
+        raise errors[0]
+    return StageTimes(busy["read"], busy["compute"], write_time, perf_counter() - t0, busy["observe"])
@@ -0,0 +1,83 @@
+"""Memory-budgeted execution plans for the image and audio paths.
+
+The planner estimates the working set per sample from the dtypes, the
+block size and the intermediate arrays a path allocates, then decides
+whether the whole input can be processed at once or has to be streamed in
+chunks of whole blocks that fit the budget.
+"""
+import re
+from typing import NamedTuple
+import numpy as np
+from utils.matrix_utils import BLAS_MIN_SIZE
+
+_UNITS = {"": 1, "B": 1, "K": 1000, "KB": 1000, "M": 1000 ** 2, "MB": 1000 ** 2, "G": 1000 ** 3, "GB": 1000 ** 3,
+          "KIB": 1024, "MIB": 1024 ** 2, "GIB": 1024 ** 3}
+
+# Bytes per sample of each intermediate array (all int64/float64)
+INTERMEDIATE_BYTES = {
+    "upcast": 8,     # astype(int64) copy of the input
+    "padded": 8,     # np.pad copy to a whole number of blocks
+    "product": 16,   # matmul result and its modulo
+    "unblock": 8,    # transposed copy before the downcast
+    "permuted": 8,   # block-permuted copy
+    "mask": 8,       # keystream mask
+    "masked": 8,     # (blocks +/- mask) % m
+    "pair_index": 4,  # np.take widens the uint16 byte-pair indices to intp, one per two samples
+}
+# Extra float64 operand/result copies when mod_matmul takes the BLAS path
+BLAS_BYTES = 16
+
+
+def parse_size(size) -> int:
+    """Bytes from an int or a string such as "512MB", "1.5GiB" or "64k"."""
+    if isinstance(size, (int, np.integer)):
+        return int(size)
+    match = re.fullmatch(r"\s*([\d.]+)\s*([a-zA-Z]*)\s*", str(size))
+    unit = match.group(2).upper() if match else None
+    if unit not in _UNITS:
+        raise ValueError(f"Invalid memory size {size!r}")
+    return int(float(match.group(1)) * _UNITS[unit])
+
+
+def working_set(dtype, block_size: int, intermediates=(), out_dtype=None) -> int:
+    """Estimated bytes per sample: input, output and the listed intermediates."""
+    per = np.dtype(dtype).itemsize + np.dtype(out_dtype or dtype).itemsize
+    per += sum(INTERMEDIATE_BYTES[name] for name in intermediates)
+    if "product" in intermediates and block_size >= BLAS_MIN_SIZE:
+        per += BLAS_BYTES
+    return per
+
+
+class Plan(NamedTuple):
+    strategy: str          # "in-memory" or "streaming"
+    chunk_blocks: int      # blocks processed per chunk
+    chunks: int
+    peak_bytes: int        # estimated peak working set
+    budget: int | None
+
+    def __str__(self):
+        budget = "no budget" if self.budget is None else f"budget {self.budget / 1e6:.1f} MB"
+        return (f"{self.strategy}: {self.chunks} chunk(s) of {self.chunk_blocks} block(s), "
+                f"~{self.peak_bytes / 1e6:.1f} MB peak ({budget})")
+
+
+def make_plan(num_samples: int, block_size: int, max_memory, per_sample: int,
+              fixed: int = 0, streaming_per_sample: int | None = None, streaming_fixed: int | None = None) -> Plan:
+    """Choose in-memory or streaming execution so the working set fits max_memory.
+
+    per_sample/fixed describe the in-memory path; the streaming_* values
+    describe one chunk of the streaming path and what it keeps resident.
+    """
+    blocks = -(-num_samples // block_size)
+    peak = num_samples * per_sample + fixed
+    budget = None if max_memory is None else parse_size(max_memory)
+    if budget is None or peak <= budget:
+        return Plan("in-memory", blocks, 1, peak, budget)
+
+    per_block = (per_sample if streaming_per_sample is None else streaming_per_sample) * block_size
+    resident = fixed if streaming_fixed is None else streaming_fixed
+    chunk_blocks = min((budget - resident) // per_block, blocks)
+    if chunk_blocks < 1:
+        raise MemoryError(f"Memory budget of {budget} bytes is too small: "
+                          f"{resident + per_block} bytes needed for a single block")
+    return Plan("streaming", chunk_blocks, -(-blocks // chunk_blocks), resident + chunk_blocks * per_block, budget)
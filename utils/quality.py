@@ -0,0 +1,173 @@
+"""Streaming randomness checks for cipher outputs.
+
+A QualityAnalyzer is fed output chunks in order and keeps only running
+totals: a symbol histogram (np.bincount), the sums behind the lag-1
+correlation of adjacent samples in the same channel, and the last sample
+of each channel. Memory does not grow with the stream, so it can watch
+every chunk an encryption pipeline writes, as the observe stage of
+run_pipeline (see the quality= argument of encrypt_image_file and
+encrypt_audio), or scan a finished file:
+
+    python -m utils.quality <file.wav|image>
+"""
+import sys
+from typing import NamedTuple
+import numpy as np
+from scipy.io import wavfile
+from scipy.special import chdtrc
+from utils.image_io import map_pixels
+
+# Words wider than this are histogrammed byte by byte
+MAX_SYMBOLS = 1 << 16
+ANALYZE_CHUNK = 1 << 22     # samples per chunk when scanning a file
+
+
+class QualityReport(NamedTuple):
+    samples: int
+    entropy: float          # bits per symbol
+    max_entropy: float      # log2 of the alphabet size
+    chi2: float             # against a uniform histogram
+    p_value: float          # chance of a chi2 this large for uniform symbols
+    correlation: float      # lag-1 correlation of adjacent samples per channel
+
+    def __str__(self):
+        return (f"{self.samples} samples: entropy {self.entropy:.4f}/{self.max_entropy:.0f} bits, "
+                f"chi2 {self.chi2:.1f} (p={self.p_value:.3f}), lag-1 correlation {self.correlation:+.5f}")
+
+
+class QualityAnalyzer:
+    """Running histogram, entropy, chi-square and lag-1 correlation over a stream of chunks.
+
+    Chunks are any arrays of cipher words, in stream order, with channels
+    interleaved. Signed and float samples are read by their bits as
+    unsigned words. modulus and channels default to those of the first
+    chunk's word size and to 1; encryption paths set them through bind().
+    """
+
+    def __init__(self, modulus: int | None = None, channels: int | None = None):
+        self.modulus = modulus
+        self.channels = channels
+        self.samples = 0
+        self._counts = None
+        # Centred samples: running sums (kept only for words wider than the histogram),
+        # the first and last sample of each channel, and the sum of adjacent products
+        self._sum = self._squares = self._cross = 0.0
+        self._head = self._tail = np.empty(0)
+
+    def bind(self, modulus: int, channels: int = 1) -> "QualityAnalyzer":
+        """Set the modulus and channel count of the stream, or check them against earlier settings."""
+        for name, value in (("modulus", modulus), ("channels", channels)):
+            current = getattr(self, name)
+            if current is not None and current != value:
+                raise ValueError(f"Analyzer {name} is {current}, stream has {value}")
+            setattr(self, name, value)
+        return self
+
+    @property
+    def symbols(self) -> int:
+        """Histogram size: the modulus, or byte values for wider words."""
+        return self.modulus if self.modulus <= MAX_SYMBOLS else 256
+
+    def update(self, chunk: np.ndarray):
+        x = np.ascontiguousarray(chunk).reshape(-1)
+        if x.dtype.kind != "u":
+            x = x.view(f"u{x.itemsize}")
+        if self.modulus is None:
+            self.modulus = 1 << (8 * x.itemsize)
+        if self.channels is None:
+            self.channels = 1
+        if not x.size:
+            return
+        if self._counts is None:
+            self._counts = np.zeros(self.symbols, dtype=np.int64)
+        self.samples += x.size
+        self._count(x if self.modulus <= MAX_SYMBOLS else x.view(np.uint8))
+
+        # Centred float64 copy, behind the previous chunk's last sample of each channel
+        lag, kept = self.channels, len(self._tail)
+        y = np.empty(kept + x.size)
+        y[:kept] = self._tail
+        new = np.subtract(x, (self.modulus - 1) / 2, out=y[kept:])
+        if self.modulus > MAX_SYMBOLS:
+            self._sum += new.sum()
+            self._squares += new @ new
+        if len(y) > lag:
+            self._cross += y[:-lag] @ y[lag:]
+        if len(self._head) < lag:
+            self._head = np.concatenate((self._head, new[:lag - len(self._head)]))
+        self._tail = y[-lag:].copy()
+
+    def _count(self, symbols: np.ndarray):
+        if symbols.itemsize == 1 and symbols.size > 1:
+            # bincount casts to intp; counting byte pairs as uint16 halves that work
+            pairs = symbols[:symbols.size // 2 * 2].view(np.uint16)
+            folded = np.bincount(pairs, minlength=1 << 16).reshape(256, 256)
+            self._counts += (folded.sum(axis=0) + folded.sum(axis=1))[:len(self._counts)]
+            if symbols.size % 2:
+                self._counts[symbols[-1]] += 1
+        else:
+            self._counts += np.bincount(symbols, minlength=len(self._counts))[:len(self._counts)]
+
+    def report(self) -> QualityReport:
+        symbols = self.symbols if self.modulus is not None else 256
+        counts = self._counts if self._counts is not None else np.zeros(symbols, dtype=np.int64)
+        total = int(counts.sum())
+        p = counts[counts > 0] / max(total, 1)
+        entropy = float(-(p * np.log2(p)).sum())
+        expected = total / symbols
+        chi2 = float(((counts - expected) ** 2).sum() / expected) if total else 0.0
+        return QualityReport(self.samples, entropy, float(np.log2(symbols)), chi2,
+                             float(chdtrc(symbols - 1, chi2)) if total else 1.0, self._correlation(counts))
+
+    def _correlation(self, counts: np.ndarray) -> float:
+        n = self.samples - len(self._tail)
+        if n <= 0:
+            return 0.0
+        if self.modulus <= MAX_SYMBOLS:
+            values = np.arange(len(counts)) - (self.modulus - 1) / 2
+            total, squares = counts @ values, counts @ (values * values)
+        else:
+            total, squares = self._sum, self._squares
+        # Pairs (a, b) = (s[i], s[i + lag]): a misses the last sample of each channel, b the first
+        sa, sb = total - self._tail.sum(), total - self._head.sum()
+        saa, sbb = squares - self._tail @ self._tail, squares - self._head @ self._head
+        cov = self._cross - sa * sb / n
+        var = (saa - sa * sa / n) * (sbb - sb * sb / n)
+        return float(cov / np.sqrt(var)) if var > 0 else 0.0
+
+
+# ---------- Files ----------
+def analyze_wav(path: str, analyzer: QualityAnalyzer | None = None) -> QualityReport:
+    """Quality report of a WAV's samples, read through a memory map chunk by chunk."""
+    try:
+        _, data = wavfile.read(path, mmap=True)
+    except ValueError:      # 24-bit PCM cannot be mapped
+        _, data = wavfile.read(path)
+    frames = data.reshape(len(data), -1)
+    analyzer = (analyzer or QualityAnalyzer()).bind(1 << (8 * data.itemsize), frames.shape[1])
+    step = max(ANALYZE_CHUNK // frames.shape[1], 1)
+    for a in range(0, len(frames), step):
+        analyzer.update(frames[a:a + step])
+    return analyzer.report()
+
+
+def analyze_image(path: str, analyzer: QualityAnalyzer | None = None) -> QualityReport:
+    """Quality report of an image's 8-bit pixels, band by band when the file can be memory-mapped."""
+    arr = map_pixels(path)
+    if arr is None:
+        from PIL import Image
+        with Image.open(path) as img:
+            arr = np.asarray(img)
+    channels = arr.shape[2] if arr.ndim == 3 else 1
+    analyzer = (analyzer or QualityAnalyzer()).bind(256, channels)
+    step = max(ANALYZE_CHUNK // (arr.size // max(len(arr), 1)), 1)
+    for r in range(0, len(arr), step):
+        analyzer.update(arr[r:r + step])
+    return analyzer.report()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    for name in sys.argv[1:]:
+        print(f"{name}: {(analyze_wav if name.lower().endswith('.wav') else analyze_image)(name)}")
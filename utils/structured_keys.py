@@ -0,0 +1,190 @@
+"""Structured Hill keys: products of circulant and permutation factors.
+
+A circulant key K with first column c acts on a block x as the cyclic
+convolution c * x, so a block costs O(n log n) instead of O(n^2). The
+convolution is done exactly with float FFTs on 8-bit limbs, and the
+inverse of a circulant is again circulant (the inverse of c(x) in
+Z_m[x]/(x^n - 1)), so large blocks never need a dense n x n matrix.
+"""
+import numpy as np
+from utils.matrix_utils import _prime_power_factors, mod_matmul
+
+
+# ---------- Exact cyclic convolution ----------
+def cyclic_convolve(X: np.ndarray, c: np.ndarray, modulus: int) -> np.ndarray:
+    """Exact (c * x) mod m for every row x of X (cyclic, along the last axis)."""
+    X = np.asarray(X, dtype=np.int64)
+    n = X.shape[-1]
+    limbs = max(1, -(-(modulus - 1).bit_length() // 8))
+    FX = [np.fft.rfft((X >> (8 * i)) & 0xFF, axis=-1) for i in range(limbs)]
+    Fc = [np.fft.rfft((c >> (8 * j)) & 0xFF) for j in range(limbs)]
+
+    out = np.zeros(X.shape, dtype=np.int64)
+    for s in range(2 * limbs - 1):
+        weight = pow(256, s, modulus)
+        if weight == 0:
+            continue
+        F = sum(FX[i] * Fc[s - i] for i in range(max(0, s - limbs + 1), min(s, limbs - 1) + 1))
+        part = np.rint(np.fft.irfft(F, n, axis=-1)).astype(np.int64) % modulus
+        out = (out + part * weight) % modulus
+    return out
+
+
+# ---------- Circulant inverse ----------
+def _trim(a: np.ndarray) -> np.ndarray:
+    nz = np.flatnonzero(a)
+    return a[:nz[-1] + 1] if nz.size else a[:1] * 0
+
+
+def _polydivmod(a: np.ndarray, b: np.ndarray, p: int):
+    """Quotient and remainder over GF(p); coefficients lowest degree first."""
+    a = a.copy()
+    db = len(b) - 1
+    lead_inv = pow(int(b[-1]), -1, p)
+    q = np.zeros(max(len(a) - db, 1), dtype=np.int64)
+    for k in range(len(a) - 1 - db, -1, -1):
+        coef = a[k + db] * lead_inv % p
+        if coef:
+            a[k:k + db + 1] = (a[k:k + db + 1] - coef * b) % p
+            q[k] = coef
+    return _trim(q), _trim(a[:max(db, 1)])
+
+
+def _poly_sub(a: np.ndarray, b: np.ndarray, p: int) -> np.ndarray:
+    out = np.zeros(max(len(a), len(b)), dtype=np.int64)
+    out[:len(a)] += a
+    out[:len(b)] -= b
+    return _trim(out % p)
+
+
+def _circulant_inv_mod_p(c: np.ndarray, p: int) -> np.ndarray | None:
+    """Inverse of c(x) in GF(p)[x]/(x^n - 1) by extended Euclid, or None."""
+    n = len(c)
+    r0 = np.zeros(n + 1, dtype=np.int64)
+    r0[0], r0[n] = p - 1, 1
+    r1 = _trim(c % p)
+    s0, s1 = np.zeros(1, dtype=np.int64), np.ones(1, dtype=np.int64)
+    while len(r1) > 1:
+        q, r = _polydivmod(r0, r1, p)
+        r0, r1 = r1, r
+        s0, s1 = s1, _poly_sub(s0, np.convolve(q, s1) % p, p)
+    if r1[0] == 0:
+        return None
+    inv = np.zeros(n, dtype=np.int64)
+    inv[:len(s1)] = s1 * pow(int(r1[0]), -1, p) % p
+    return inv
+
+
+def circulant_inverse(c: np.ndarray, modulus: int) -> np.ndarray:
+    """First column of the inverse of the circulant with first column c, mod m."""
+    c = np.asarray(c, dtype=np.int64) % modulus
+    e = np.zeros(len(c), dtype=np.int64)
+    e[0] = 1
+    out = np.zeros(len(c), dtype=np.int64)
+    for p, q in _prime_power_factors(modulus):
+        g = _circulant_inv_mod_p(c % p, p)
+        if g is None:
+            raise ValueError(f"Circulant key not invertible mod {modulus}")
+        # Newton/Hensel lifting: g <- g (2 - c g) doubles the p-adic precision
+        precision = p
+        while precision < q:
+            cg = cyclic_convolve(g[np.newaxis], c % q, q)[0]
+            g = cyclic_convolve(g[np.newaxis], (2 * e - cg) % q, q)[0]
+            precision *= precision
+        rest = modulus // q
+        coef = rest * pow(rest, -1, q) % modulus if rest > 1 else 1
+        out = (out + g * coef) % modulus
+    return out
+
+
+# ---------- Keys ----------
+class StructuredKey:
+    """Key matrix K = F_0 @ F_1 @ ... built from circulant and permutation factors.
+
+    Factors are ("circulant", c) with c the first column, or ("permutation", p)
+    with (P x)[i] = x[p[i]]. Supports K @ B (column blocks, as in Hill) and
+    A @ K (row blocks, as in the audio cipher) without forming K.
+    """
+    # Make ndarray @ key defer to __rmatmul__ instead of converting the key
+    __array_ufunc__ = None
+
+    def __init__(self, factors, modulus: int = 256):
+        self.factors = [(kind, np.asarray(f, dtype=np.int64) % (modulus if kind == "circulant" else len(f)))
+                        for kind, f in factors]
+        self.modulus = modulus
+        self.n = len(self.factors[0][1])
+        self.shape = (self.n, self.n)
+        self._inverse = None
+        for kind, f in self.factors:
+            if kind not in ("circulant", "permutation"):
+                raise ValueError(f"Unknown key factor {kind!r}")
+            if len(f) != self.n:
+                raise ValueError("All key factors must have the same size")
+
+    @classmethod
+    def circulant(cls, column, modulus: int = 256) -> "StructuredKey":
+        return cls([("circulant", column)], modulus)
+
+    @classmethod
+    def random(cls, n: int, modulus: int = 256, rounds: int = 1, seed=None) -> "StructuredKey":
+        """Random invertible key: circulant factors interleaved with permutations."""
+        rng = np.random.default_rng(seed)
+        factors = []
+        for r in range(rounds):
+            if r:
+                factors.append(("permutation", rng.permutation(n)))
+            while True:
+                c = rng.integers(0, modulus, size=n, dtype=np.int64)
+                try:
+                    circulant_inverse(c, modulus)
+                    break
+                except ValueError:
+                    continue
+            factors.append(("circulant", c))
+        return cls(factors, modulus)
+
+    def apply(self, blocks: np.ndarray) -> np.ndarray:
+        """K x mod m for every row x of blocks (shape (m, n) or (n,))."""
+        X = np.asarray(blocks, dtype=np.int64) % self.modulus
+        for kind, f in reversed(self.factors):
+            X = cyclic_convolve(X, f, self.modulus) if kind == "circulant" else X[..., f]
+        return X
+
+    def __matmul__(self, B):
+        return self.apply(np.asarray(B).T).T
+
+    def __rmatmul__(self, A):
+        return self.T.apply(A)
+
+    @property
+    def T(self) -> "StructuredKey":
+        factors = [("circulant", np.roll(f[::-1], 1)) if kind == "circulant" else ("permutation", np.argsort(f))
+                   for kind, f in reversed(self.factors)]
+        return StructuredKey(factors, self.modulus)
+
+    def inverse(self) -> "StructuredKey":
+        if self._inverse is None:
+            factors = [("circulant", circulant_inverse(f, self.modulus)) if kind == "circulant"
+                       else ("permutation", np.argsort(f))
+                       for kind, f in reversed(self.factors)]
+            self._inverse = StructuredKey(factors, self.modulus)
+        return self._inverse
+
+    def to_dense(self) -> np.ndarray:
+        return self.apply(np.eye(self.n, dtype=np.int64)).T
+
+    def __repr__(self):
+        kinds = " @ ".join(kind for kind, _ in self.factors)
+        return f"StructuredKey(n={self.n}, modulus={self.modulus}, {kinds})"
+
+
+def key_product(A, B, modulus: int):
+    """A @ B mod m for dense or structured keys (structured only if both are)."""
+    if isinstance(A, StructuredKey) and isinstance(B, StructuredKey):
+        product = StructuredKey(A.factors + B.factors, modulus)
+        if A._inverse is not None and B._inverse is not None:
+            product._inverse = StructuredKey(B._inverse.factors + A._inverse.factors, modulus)
+        return product
+    A = A.to_dense() if isinstance(A, StructuredKey) else np.asarray(A, dtype=np.int64)
+    B = B.to_dense() if isinstance(B, StructuredKey) else np.asarray(B, dtype=np.int64)
+    return mod_matmul(A, B, modulus)
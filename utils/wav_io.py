@@ -0,0 +1,42 @@
+"""Streaming WAV output: preallocated files whose samples are a memmap."""
+import os
+import struct
+import numpy as np
+
+PCM_HEADER_SIZE = 44
+
+
+def pcm_header(rate: int, num_samples: int, dtype=np.int16, channels: int = 1) -> bytes:
+    """Canonical 44-byte header for num_samples samples (all channels), as scipy writes for integer PCM.
+
+    Float samples get format tag 3 (IEEE float) in the same layout.
+    """
+    width = np.dtype(dtype).itemsize
+    data_size = num_samples * width
+    tag = 3 if np.dtype(dtype).kind == "f" else 1
+    return (b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, tag, channels, rate, rate * channels * width, channels * width, width * 8)
+            + b"data" + struct.pack("<I", data_size))
+
+
+def create_wav(path: str, rate: int, num_samples: int, dtype=np.int16, channels: int = 1) -> np.memmap:
+    """Create a WAV of num_samples samples and return them as a writable memmap."""
+    with open(path, "wb") as f:
+        f.write(pcm_header(rate, num_samples, dtype, channels))
+        f.truncate(PCM_HEADER_SIZE + num_samples * np.dtype(dtype).itemsize)
+    return np.memmap(path, dtype=np.dtype(dtype).newbyteorder("<"), mode="r+",
+                     offset=PCM_HEADER_SIZE, shape=(num_samples,))
+
+
+def open_wav(path: str, rate: int, num_samples: int, dtype=np.int16, channels: int = 1) -> np.memmap | None:
+    """Reopen a WAV written by create_wav as a writable memmap, or None if it does not match."""
+    size = PCM_HEADER_SIZE + num_samples * np.dtype(dtype).itemsize
+    try:
+        with open(path, "rb") as f:
+            header = f.read(PCM_HEADER_SIZE)
+        if header != pcm_header(rate, num_samples, dtype, channels) or os.path.getsize(path) != size:
+            return None
+    except FileNotFoundError:
+        return None
+    return np.memmap(path, dtype=np.dtype(dtype).newbyteorder("<"), mode="r+",
+                     offset=PCM_HEADER_SIZE, shape=(num_samples,))